@@ -1,7 +1,7 @@
 # app/agents/base_agent.py
 from abc import ABC, abstractmethod
 from typing import Dict, List, Any, Optional
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from app.core.observability import observability
 from loguru import logger
@@ -14,16 +14,17 @@ class AgentResponse(BaseModel):
     success: bool
     data: Optional[Dict[str, Any]] = None
     error: Optional[str] = None
-    metadata: Dict[str, Any] = {}
-    timestamp: datetime = datetime.utcnow()
+    metadata: Dict[str, Any] = Field(default_factory=dict)
+    timestamp: datetime = Field(default_factory=datetime.utcnow)
 
 class AgentRequest(BaseModel):
     """Standard request format for all agents"""
     query: str
-    context: Dict[str, Any] = {}
+    context: Dict[str, Any] = Field(default_factory=dict)
     session_id: Optional[str] = None
     user_id: Optional[str] = None
-    parameters: Dict[str, Any] = {}
+    parameters: Dict[str, Any] = Field(default_factory=dict)
+    dependency_outputs: Dict[str, Any] = Field(default_factory=dict)  # Upstream agent key -> its response data
 
 class BaseAgent(ABC):
     """Abstract base class for all agents"""
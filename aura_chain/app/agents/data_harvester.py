@@ -1,10 +1,18 @@
 from app.agents.base_agent import BaseAgent, AgentRequest, AgentResponse
 from app.core.api_clients import google_client
 from app.config import get_settings
+from app.utils.datasets import get_context_dataset
 import pandas as pd
 import numpy as np
 import json
-from typing import Dict, List, Tuple
+import re
+import copy
+import hashlib
+from collections import OrderedDict
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+from pandas.api.types import is_numeric_dtype, is_datetime64_any_dtype, is_object_dtype
 from loguru import logger
 
 settings = get_settings()
@@ -19,6 +27,26 @@ class DataHarvesterAgent(BaseAgent):
     - Data validation
     """
     
+    # Leading YYYY-MM-DD, the layout pandas can parse with format='ISO8601'
+    ISO_DATE_PATTERN = re.compile(r'^\d{4}-\d{2}-\d{2}')
+    DATE_PROBE_SAMPLE_SIZE = 500
+    # Cheap pre-filter: numeric day/month/year layouts such as 2024-01-31 or 31/01/2024
+    DATE_LIKE_PATTERN = re.compile(r'^\d{2,4}[-/.\s]\d{1,2}[-/.\s]\d{1,4}')
+    DATE_NAME_HINTS = frozenset({'date', 'time', 'dt', 'datetime', 'timestamp', 'created', 'updated', 'dob'})
+    # Quantity/price-like words; columns named with them must not hold negative values
+    VALUE_COLUMN_WORDS = frozenset({'price', 'quantity', 'amount', 'sales', 'revenue', 'cost'})
+    NAME_SEPARATOR_PATTERN = re.compile(r'[_\W]+')
+    CAMEL_CASE_PATTERN = re.compile(r'([a-z0-9])([A-Z])')
+    # Shared across uploads so date parsing never pays for thread startup;
+    # threads are spawned lazily on first use
+    _date_parse_pool = ThreadPoolExecutor(max_workers=os.cpu_count() or 1, thread_name_prefix="date-parse")
+    
+    # Parsed LLM quality analyses keyed by prompt hash. Class-level so every
+    # agent instance shares it.
+    QUALITY_CACHE_SIZE = 512
+    PROMPT_MAX_OPERATIONS = 50
+    _quality_cache: "OrderedDict[str, Dict]" = OrderedDict()
+    
     def __init__(self):
         super().__init__(
             name="DataHarvester",
@@ -37,22 +65,21 @@ Return results in JSON format."""
     
     async def process(self, request: AgentRequest) -> AgentResponse:
         try:
-            if "dataset" not in request.context:
+            # Load data
+            df = await get_context_dataset(request.context)
+            if df is None:
                 return AgentResponse(
                     agent_name=self.name,
                     success=False,
                     error="No dataset provided in context"
                 )
+            logger.info(f"Processing dataset: {df.shape}")
             
-            # Load data
-            df_original = pd.DataFrame(request.context["dataset"])
-            logger.info(f"Processing dataset: {df_original.shape}")
-            
-            # Store original stats
-            original_stats = self._get_dataset_stats(df_original)
+            # Store original stats (before cleaning mutates the frame)
+            original_stats = self._get_dataset_stats(df)
             
-            # Clean the data
-            df_cleaned, cleaning_log = self._clean_dataset(df_original)
+            # Clean the data in place
+            df_cleaned, cleaning_log = self._clean_dataset(df)
             
             # Get cleaned stats
             cleaned_stats = self._get_dataset_stats(df_cleaned)
@@ -68,13 +95,15 @@ Return results in JSON format."""
             # Use LLM for quality assessment
             analysis = await self._get_quality_analysis(profile, request.query)
             
-            return AgentResponse(
+            # Every field is built here, so skip Pydantic's validation walk over the payload
+            return AgentResponse.model_construct(
                 agent_name=self.name,
                 success=True,
                 data={
                     "profile": profile,
                     "analysis": analysis,
-                    "processed_data": df_cleaned.to_dict('records'),
+                    # Pre-serialized JSON records: built in C and skips per-row dicts
+                    "processed_data": df_cleaned.to_json(orient='records', date_format='iso'),
                     "metadata": {
                         "rows_processed": len(df_cleaned),
                         "columns_processed": len(df_cleaned.columns),
@@ -92,64 +121,143 @@ Return results in JSON format."""
             )
     
     def _clean_dataset(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-        """Apply comprehensive data cleaning"""
-        df_clean = df.copy()
+        """Apply comprehensive data cleaning in place (no defensive copy of df)"""
         cleaning_log = []
         
-        # 1. Parse dates
-        df_clean, date_log = self._parse_dates(df_clean)
+        # 1. Parse dates (date_cols is reused below instead of rescanning dtypes)
+        df, date_log, date_cols = self._parse_dates(df)
         cleaning_log.extend(date_log)
         
-        # 2. Handle missing values
-        df_clean, missing_log = self._handle_missing_values(df_clean)
+        # 2. Downcast integer columns so the remaining passes move half the bytes
+        df, downcast_log = self._downcast_numeric(df)
+        cleaning_log.extend(downcast_log)
+        
+        # 3. Handle missing values
+        df, missing_log = self._handle_missing_values(df, date_cols)
         cleaning_log.extend(missing_log)
         
-        # 3. Handle outliers
-        df_clean, outlier_log = self._handle_outliers(df_clean)
-        cleaning_log.extend(outlier_log)
+        # 4. Cap outliers and fix negative values (one pass over numeric columns)
+        df, numeric_log = self._clean_numeric_columns(df)
+        cleaning_log.extend(numeric_log)
         
-        # 4. Validate data
-        df_clean, validation_log = self._validate_data(df_clean)
+        # 5. Validate data
+        df, validation_log = self._validate_data(df)
         cleaning_log.extend(validation_log)
         
-        # 5. Sort by date if present
-        date_cols = df_clean.select_dtypes(include=['datetime64']).columns
+        # 6. Sort by date if present
         if len(date_cols) > 0:
-            df_clean = df_clean.sort_values(date_cols[0])
+            df = df.sort_values(date_cols[0])
             cleaning_log.append(f"Sorted by {date_cols[0]}")
         
         logger.info(f"Cleaning complete: {len(cleaning_log)} operations")
-        return df_clean, cleaning_log
+        return df, cleaning_log
     
-    def _parse_dates(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-        """Auto-detect and parse date columns"""
+    def _parse_dates(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str], List[str]]:
+        """Auto-detect and parse date columns; also returns every datetime column in order"""
         log = []
         
+        date_cols = set()
+        candidates = []
         for col in df.columns:
-            if df[col].dtype == 'object':
-                try:
-                    # Try parsing as date
-                    df[col] = pd.to_datetime(df[col], errors='coerce')
-                    if df[col].notna().sum() > len(df) * 0.5:  # >50% successfully parsed
-                        log.append(f"Parsed '{col}' as datetime")
-                    else:
-                        # Revert if parsing failed for most values
-                        df[col] = df[col].astype(str)
-                except Exception as e:
-                    pass
+            if is_datetime64_any_dtype(df[col]):
+                date_cols.add(col)
+            elif is_object_dtype(df[col]):
+                values = df[col].dropna()
+                if values.empty or not self._could_be_date(col, values):
+                    continue
+                candidates.append((col, values))
+        
+        if not candidates:
+            return df, log, [col for col in df.columns if col in date_cols]
+        
+        # Columns parse independently, and to_datetime spends most of its time in C,
+        # so several candidate columns are parsed side by side
+        if len(candidates) == 1:
+            results = [self._parse_date_column(df[candidates[0][0]], candidates[0][1])]
+        else:
+            results = list(self._date_parse_pool.map(
+                lambda candidate: self._parse_date_column(df[candidate[0]], candidate[1]),
+                candidates
+            ))
+        
+        for (col, _), parsed in zip(candidates, results):
+            if parsed is not None:
+                df[col] = parsed
+                date_cols.add(col)
+                log.append(f"Parsed '{col}' as datetime")
+        
+        return df, log, [col for col in df.columns if col in date_cols]
+    
+    def _parse_date_column(self, column: pd.Series, values: pd.Series) -> Optional[pd.Series]:
+        """Parse one object column as datetime; None if most values are not dates"""
+        # ISO strings can take pandas' fast C parser instead of per-element inference
+        first = values.iloc[0]
+        date_format = 'ISO8601' if isinstance(first, str) and self.ISO_DATE_PATTERN.match(first) else None
+        
+        try:
+            # Probe a sample first so non-date columns never pay for a full parse
+            sample = values.sample(min(self.DATE_PROBE_SAMPLE_SIZE, len(values)), random_state=0)
+            probe = pd.to_datetime(sample, errors='coerce', format=date_format, cache=True)
+            if probe.notna().mean() <= 0.5:
+                return None
+            
+            # Try parsing as date (cache=True parses each distinct string once)
+            parsed = pd.to_datetime(column, errors='coerce', format=date_format, cache=True)
+            if parsed.notna().sum() > len(column) * 0.5:  # >50% successfully parsed
+                return parsed
+        except Exception as e:
+            pass
+        
+        return None
+    
+    def _could_be_date(self, col: str, values: pd.Series) -> bool:
+        """Cheap check on the first few values that rules out obvious non-date columns"""
+        head = values.head(20).astype(str)
+        if head.map(lambda v: bool(self.DATE_LIKE_PATTERN.match(v))).sum() * 2 >= len(head):
+            return True
+        
+        # Textual dates ("Jan 5, 2024") only count when the column name suggests a date
+        # Hints match whole words, so 'width' or 'bandwidth' never hit 'dt'
+        first_len = len(head.iloc[0])
+        return not self.DATE_NAME_HINTS.isdisjoint(self._name_words(str(col))) and 6 <= first_len <= 30
+    
+    def _downcast_numeric(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Downcast int64 columns to int32 where the values fit. Floats stay
+        float64: float32 would change the values users see and keeps only
+        ~7 significant digits in every downstream statistic.
+        """
+        log = []
+        downcast = []
+        int32 = np.iinfo(np.int32)
+        
+        for col in df.columns:
+            if df[col].dtype == 'int64' and len(df) > 0 and int32.min <= df[col].min() and df[col].max() <= int32.max:
+                df[col] = df[col].astype(np.int32)
+                downcast.append(col)
+        
+        if downcast:
+            log.append(f"Downcast {len(downcast)} integer columns to 32-bit")
         
         return df, log
     
-    def _handle_missing_values(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+    def _handle_missing_values(self, df: pd.DataFrame, date_cols: List[str]) -> Tuple[pd.DataFrame, List[str]]:
         """Impute missing values using appropriate strategies"""
         log = []
         
-        for col in df.columns:
-            missing_count = df[col].isna().sum()
-            
-            if missing_count == 0:
-                continue
-            
+        # Count missing values for every column in a single scan
+        na_counts = df.isna().sum()
+        na_counts = na_counts[na_counts > 0]
+        if na_counts.empty:
+            return df, log
+        
+        numeric_cols = set(df.select_dtypes(include=[np.number]).columns)
+        object_cols = {c for c in df.columns if is_object_dtype(df[c])}
+        has_dates = len(date_cols) > 0
+        numeric_to_fill = []
+        object_to_fill = []
+        
+        for col, missing_count in na_counts.items():
             missing_pct = (missing_count / len(df)) * 100
             
             # If too many missing (>50%), flag but don't impute
@@ -158,76 +266,144 @@ Return results in JSON format."""
                 continue
             
             # Numeric columns
-            if df[col].dtype in ['int64', 'float64']:
-                # Check if time-series (has date column)
-                date_cols = df.select_dtypes(include=['datetime64']).columns
-                
-                if len(date_cols) > 0:
-                    # Use interpolation for time-series
-                    df[col] = df[col].interpolate(method='linear', limit_direction='both')
+            if col in numeric_cols:
+                numeric_to_fill.append(col)
+                if has_dates:
                     log.append(f"Interpolated {missing_count} missing values in '{col}'")
                 else:
-                    # Use mean for non-temporal data
-                    df[col] = df[col].fillna(df[col].mean())
                     log.append(f"Filled {missing_count} missing values in '{col}' with mean")
             
             # Categorical columns
-            elif df[col].dtype == 'object':
-                mode_value = df[col].mode()
-                if len(mode_value) > 0:
-                    df[col] = df[col].fillna(mode_value[0])
-                    log.append(f"Filled {missing_count} missing values in '{col}' with mode")
+            elif col in object_cols:
+                object_to_fill.append(col)
+                log.append(f"Filled {missing_count} missing values in '{col}' with mode")
+        
+        # Impute each column group with one vectorized call instead of one per column
+        if numeric_to_fill:
+            if has_dates:
+                # Use interpolation for time-series
+                df[numeric_to_fill] = df[numeric_to_fill].interpolate(method='linear', limit_direction='both')
+            else:
+                # Use mean for non-temporal data
+                df[numeric_to_fill] = df[numeric_to_fill].fillna(df[numeric_to_fill].mean())
+        
+        if object_to_fill:
+            modes = df[object_to_fill].mode().iloc[0]
+            df[object_to_fill] = df[object_to_fill].fillna(modes)
         
         return df, log
     
-    def _handle_outliers(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
-        """Cap outliers using IQR method (don't drop)"""
+    def _clean_numeric_columns(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
+        """
+        Cap outliers using IQR method (don't drop) and fix negative values
+        in quantity/price columns, reading and writing each column once
+        """
         log = []
         
         numeric_cols = df.select_dtypes(include=[np.number]).columns
+        if len(numeric_cols) == 0:
+            return df, log
+        
+        value_cols = {col for col in numeric_cols if self._is_value_column(str(col))}
+        
+        # IQR bounds and outlier counts for every numeric column in one vectorized call each
+        numeric = df[numeric_cols]
+        quartiles = numeric.quantile([0.25, 0.75])
+        Q1 = quartiles.loc[0.25]
+        Q3 = quartiles.loc[0.75]
+        IQR = Q3 - Q1
+        
+        lower_bounds = Q1 - 1.5 * IQR
+        upper_bounds = Q3 + 1.5 * IQR
+        
+        outlier_counts = (numeric.lt(lower_bounds, axis=1) | numeric.gt(upper_bounds, axis=1)).sum()
         
         for col in numeric_cols:
-            Q1 = df[col].quantile(0.25)
-            Q3 = df[col].quantile(0.75)
-            IQR = Q3 - Q1
-            
-            lower_bound = Q1 - 1.5 * IQR
-            upper_bound = Q3 + 1.5 * IQR
-            
-            outliers = ((df[col] < lower_bound) | (df[col] > upper_bound)).sum()
+            series = df[col]
+            changed = False
+            outliers = outlier_counts[col]
             
             if outliers > 0:
                 # Cap values instead of dropping
-                df[col] = df[col].clip(lower=lower_bound, upper=upper_bound)
+                lower_bound = lower_bounds[col]
+                upper_bound = upper_bounds[col]
+                if isinstance(series.dtype, np.dtype) and series.dtype.kind == 'f':
+                    # Clip in place on a private copy: df may share buffers with
+                    # a frame other code still reads
+                    values = series.to_numpy(copy=True)
+                    np.clip(values, lower_bound, upper_bound, out=values)
+                    series = pd.Series(values, index=series.index)
+                else:
+                    # Integer columns become float when clipped to fractional bounds
+                    series = series.clip(lower=lower_bound, upper=upper_bound)
+                changed = True
                 log.append(f"Capped {outliers} outliers in '{col}' to IQR bounds")
+            
+            # Check for negative values in quantity/price columns
+            if col in value_cols and is_numeric_dtype(series):
+                if isinstance(series.dtype, np.dtype):
+                    # Count on the raw buffer; abs is written in place into a private copy
+                    values = series.to_numpy()
+                    negative_count = int((values < 0).sum())
+                    if negative_count > 0:
+                        values = series.to_numpy(copy=True)
+                        np.abs(values, out=values)
+                        series = pd.Series(values, index=series.index)
+                else:
+                    # Nullable extension dtypes keep the pandas path
+                    negative_count = (series < 0).sum()
+                    if negative_count > 0:
+                        series = series.abs()
+                
+                if negative_count > 0:
+                    changed = True
+                    log.append(f"Fixed {negative_count} negative values in '{col}'")
+            
+            if changed:
+                df[col] = series
         
         return df, log
     
+    def _is_value_column(self, col: str) -> bool:
+        """
+        Match value words at the end of a name word, allowing a plural
+        ('prices', 'quantities') or a prefix ('unitprice'), so 'costume_id'
+        is still not mistaken for a cost column
+        """
+        for word in self._name_words(col):
+            if word.endswith('ies'):
+                stem = word[:-3] + 'y'
+            elif word.endswith('s'):
+                stem = word[:-1]
+            else:
+                stem = word
+            if any(w.endswith(value) for w in (word, stem) for value in self.VALUE_COLUMN_WORDS):
+                return True
+        return False
+    
+    def _name_words(self, col: str) -> List[str]:
+        """Lower-cased words of a column name, split on '_', punctuation and camelCase"""
+        return self.NAME_SEPARATOR_PATTERN.split(self.CAMEL_CASE_PATTERN.sub(r'\1_\2', col).lower())
+    
     def _validate_data(self, df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
         """Validate and fix data quality issues"""
         log = []
         
-        # Check for negative values in quantity/price columns
-        value_cols = ['price', 'quantity', 'amount', 'sales', 'revenue', 'cost']
-        
-        for col in df.columns:
-            if any(v in col.lower() for v in value_cols):
-                if df[col].dtype in ['int64', 'float64']:
-                    negative_count = (df[col] < 0).sum()
-                    if negative_count > 0:
-                        df[col] = df[col].abs()
-                        log.append(f"Fixed {negative_count} negative values in '{col}'")
-        
-        # Remove duplicate rows
-        duplicates = df.duplicated().sum()
+        # Remove duplicate rows (one hashing pass; the row delta is the duplicate count)
+        rows_before = len(df)
+        df = df.drop_duplicates(ignore_index=True)
+        duplicates = rows_before - len(df)
         if duplicates > 0:
-            df = df.drop_duplicates()
             log.append(f"Removed {duplicates} duplicate rows")
         
         return df, log
     
     def _get_dataset_stats(self, df: pd.DataFrame) -> Dict:
         """Get comprehensive dataset statistics"""
+        # Null counts are scanned once and shared by both missing-value views
+        null_counts = df.isnull().sum()
+        numeric = df.select_dtypes(include='number')
+        
         return {
             "shape": {
                 "rows": int(df.shape[0]),
@@ -235,12 +411,13 @@ Return results in JSON format."""
             },
             "columns": list(df.columns),
             "dtypes": {col: str(dtype) for col, dtype in df.dtypes.items()},
-            "missing_values": {col: int(count) for col, count in df.isnull().sum().items()},
+            "missing_values": {col: int(count) for col, count in null_counts.items()},
             "missing_percentage": {
                 col: float((count / len(df)) * 100) 
-                for col, count in df.isnull().sum().items()
+                for col, count in null_counts.items()
             },
-            "numeric_summary": df.describe().to_dict() if len(df.select_dtypes(include='number').columns) > 0 else {},
+            # Only the statistics we report; describe() would also sort for percentiles
+            "numeric_summary": numeric.agg(['count', 'mean', 'std', 'min', 'max']).to_dict() if len(numeric.columns) > 0 else {},
             "sample_data": df.head(3).to_dict('records')
         }
     
@@ -265,19 +442,24 @@ Return results in JSON format."""
     
     async def _get_quality_analysis(self, profile: Dict, query: str) -> Dict:
         """Get LLM analysis of data quality"""
+        original_missing = sum(profile['original']['missing_values'].values())
+        cleaned_missing = sum(profile['cleaned']['missing_values'].values())
+        
+        # Compact, capped operation list: prompt tokens drive LLM latency and cost
+        operations = "; ".join(profile['cleaning_operations'][:self.PROMPT_MAX_OPERATIONS])
         
         prompt = f"""Analyze this data quality report:
 
 Original Dataset:
 - Rows: {profile['original']['shape']['rows']}
-- Missing values: {sum(profile['original']['missing_values'].values())}
+- Missing values: {original_missing}
 
 Cleaned Dataset:
 - Rows: {profile['cleaned']['shape']['rows']}
-- Missing values: {sum(profile['cleaned']['missing_values'].values())}
+- Missing values: {cleaned_missing}
 
 Cleaning Operations:
-{json.dumps(profile['cleaning_operations'], indent=2)}
+{operations}
 
 Quality Score: {profile['improvement_score']}/100
 
@@ -293,6 +475,13 @@ Provide analysis in JSON format:
     "ready_for_analysis": true/false
 }}"""
         
+        # Identical profiles produce byte-identical prompts; skip the round-trip
+        cache_key = hashlib.blake2b(f"{self.model}\n{prompt}".encode(), digest_size=16).hexdigest()
+        cached = self._quality_cache.get(cache_key)
+        if cached is not None:
+            self._quality_cache.move_to_end(cache_key)
+            return copy.deepcopy(cached)
+        
         try:
             response = await self.api_client.generate_content(
                 model_name=self.model,
@@ -309,13 +498,19 @@ Provide analysis in JSON format:
             elif "```" in content:
                 content = content.split("```")[1].split("```")[0].strip()
             
-            return json.loads(content)
+            analysis = json.loads(content)
+            
+            self._quality_cache[cache_key] = copy.deepcopy(analysis)
+            if len(self._quality_cache) > self.QUALITY_CACHE_SIZE:
+                self._quality_cache.popitem(last=False)
+            
+            return analysis
             
         except Exception as e:
             logger.warning(f"LLM analysis failed: {e}")
             return {
                 "data_quality_score": profile['improvement_score'],
-                "issues_found": [f"Found {sum(profile['original']['missing_values'].values())} missing values"],
+                "issues_found": [f"Found {original_missing} missing values"],
                 "fixes_applied": profile['cleaning_operations'],
                 "recommendations": ["Data is ready for analysis"],
                 "ready_for_analysis": True
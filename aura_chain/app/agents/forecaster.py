@@ -2,6 +2,7 @@
 from app.agents.base_agent import BaseAgent, AgentRequest, AgentResponse
 from app.core.api_clients import google_client
 from app.config import get_settings
+from app.utils.datasets import get_context_dataset
 import pandas as pd
 import numpy as np
 from prophet import Prophet
@@ -31,14 +32,13 @@ class ForecasterAgent(BaseAgent):
     async def process(self, request: AgentRequest) -> AgentResponse:
         try:
             # Validate input
-            if "dataset" not in request.context:
+            df = await get_context_dataset(request.context)
+            if df is None:
                 return AgentResponse(
                     agent_name=self.name,
                     success=False,
                     error="No dataset provided in context"
                 )
-            
-            df = pd.DataFrame(request.context["dataset"])
             forecast_periods = request.parameters.get("periods", 30)
             
             logger.info(f"Starting forecast for {forecast_periods} periods")
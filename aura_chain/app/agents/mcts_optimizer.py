@@ -2,89 +2,160 @@
 from app.agents.base_agent import BaseAgent, AgentRequest, AgentResponse
 from app.core.api_clients import google_client
 from app.config import get_settings
+from app.utils.datasets import load_dataset
 import numpy as np
 import pandas as pd
-from typing import Dict, List, Optional
-from dataclasses import dataclass
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple
 import math
-import json
+import hashlib
+import orjson
+from collections import OrderedDict
+from numba import njit
 from loguru import logger
 
 settings = get_settings()
 
 
-@dataclass
-class InventoryState:
-    """Represents inventory state at a point in time"""
+@njit(cache=True, fastmath=True)
+def _rollout_kernel(
+    stock0: np.ndarray,
+    start_day: np.ndarray,
+    action_traj: np.ndarray,
+    demand_matrix: np.ndarray,
+    holding_cost: float,
+    stockout_cost: float
+) -> np.ndarray:
+    """
+    Simulate B rollouts, each from its own starting stock and day.
+    action_traj and demand_matrix are (B, horizon); a row only starts accruing
+    cost from its start_day column. Returns the (B,) cost of each path.
+    """
+    batch_size, horizon = demand_matrix.shape
+    cost = np.zeros(batch_size)
+    
+    for b in range(batch_size):
+        stock = stock0[b]
+        path_cost = 0.0
+        for t in range(start_day[b], horizon):
+            # Branchless max(0, diff) / max(0, -diff): random demand makes the
+            # stockout branch unpredictable, and this form vectorizes
+            diff = stock + action_traj[b, t] - demand_matrix[b, t]
+            abs_diff = abs(diff)
+            stock = 0.5 * (diff + abs_diff)
+            path_cost += holding_cost * stock + stockout_cost * 0.5 * (abs_diff - diff)
+        cost[b] = path_cost
+    
+    return cost
+
+
+@njit(cache=True, fastmath=True)
+def _baseline_cost_kernel(stock: float, demands: np.ndarray, holding_cost: float, stockout_cost: float) -> float:
+    """Cost of never reordering over the given daily demands"""
+    cost = 0.0
+    for t in range(demands.shape[0]):
+        diff = stock - demands[t]
+        abs_diff = abs(diff)
+        stock = 0.5 * (diff + abs_diff)
+        cost += holding_cost * stock + stockout_cost * 0.5 * (abs_diff - diff)
+    return cost
+
+
+class InventoryState(NamedTuple):
+    """Represents inventory state at a point in time (immutable tuple, no per-instance __dict__)"""
     current_stock: float
     day: int
     total_cost: float = 0.0
+
+
+def _make_transition(holding_cost: float, stockout_cost: float):
+    """
+    One-day inventory transition specialized for one search's fixed costs: the order
+    arrives instantly, demand is filled from stock, and leftover stock is charged
+    holding cost while unmet demand is charged stockout cost. Works on plain
+    (stock, day, total_cost) tuples to skip per-step object construction.
+    """
+    def transition(stock: float, day: int, total_cost: float, order_qty: float, demand: float) -> Tuple[float, int, float]:
+        new_stock = stock + order_qty
+        if demand > new_stock:
+            return 0.0, day + 1, total_cost + stockout_cost * (demand - new_stock)
+        ending_stock = new_stock - demand
+        return ending_stock, day + 1, total_cost + holding_cost * ending_stock
     
-    def is_terminal(self, horizon: int) -> bool:
-        """Check if we've reached the planning horizon"""
-        return self.day >= horizon
-    
-    def transition(self, order_qty: float, demand: float, holding_cost: float, stockout_cost: float) -> 'InventoryState':
-        """Simulate one day transition"""
-        # Receive order (simplified: instant delivery)
-        new_stock = self.current_stock + order_qty
-        
-        # Fulfill demand
-        fulfilled = min(demand, new_stock)
-        stockout = max(0, demand - new_stock)
-        ending_stock = max(0, new_stock - demand)
-        
-        # Calculate costs
-        day_holding_cost = holding_cost * ending_stock
-        day_stockout_cost = stockout_cost * stockout
-        
-        return InventoryState(
-            current_stock=ending_stock,
-            day=self.day + 1,
-            total_cost=self.total_cost + day_holding_cost + day_stockout_cost
-        )
+    return transition
 
 
-class MCTSNode:
-    """Node in Monte Carlo Tree Search"""
+class MCTSTree:
+    """
+    Monte Carlo search tree stored as parallel arrays (structure of arrays).
+    Node i's statistics and inventory state live at index i of each array; node 0 is the root.
+    """
     
-    def __init__(self, state: InventoryState, parent: Optional['MCTSNode'] = None, action: float = 0, untried_actions: List[float] = None):
-        self.state = state
-        self.parent = parent
-        self.action = action  # Order quantity to get here
-        self.children: List['MCTSNode'] = []
-        self.visits = 0
-        self.total_reward = 0.0
-        # FIX: Ensure new nodes receive the list of possible actions
-        self.untried_actions = untried_actions if untried_actions is not None else []
+    def __init__(self, capacity: int, n_actions: int, root_state: Tuple[float, int, float]):
+        self.n_actions = n_actions
+        self.visits = np.zeros(capacity, dtype=np.float64)  # float: priors add fractional visits
+        self.total_reward = np.zeros(capacity, dtype=np.float64)
+        self.n_hat = np.zeros(capacity, dtype=np.int64)  # Virtual (pending) visits not yet backpropagated
+        self.action_idx = np.full(capacity, -1, dtype=np.int32)  # Index into action_space of the order that led here
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        # children[i, k] is the k-th expanded child of node i; actions are expanded in order,
+        # so the next untried action of node i is n_children[i]
+        self.children = np.full((capacity, n_actions), -1, dtype=np.int32)
+        self.n_children = np.zeros(capacity, dtype=np.int32)
+        # State reached by the sampled transition when the node was expanded
+        self.stock = np.zeros(capacity, dtype=np.float64)
+        self.day = np.zeros(capacity, dtype=np.int64)
+        self.cost = np.zeros(capacity, dtype=np.float64)
+        self.size = 0
+        self._store(root_state)
     
-    def is_fully_expanded(self) -> bool:
-        return len(self.untried_actions) == 0
+    def _store(self, state: Tuple[float, int, float]) -> int:
+        node = self.size
+        self.size += 1
+        self.stock[node], self.day[node], self.cost[node] = state
+        return node
     
-    def best_child(self, exploration_weight: float = 1.414) -> 'MCTSNode':
-        """Select child using UCB1 formula"""
-        if not self.children:
-             # Safety valve if logic goes wrong, though logic below prevents this
-            return self 
-            
-        return max(
-            self.children,
-            key=lambda c: (c.total_reward / c.visits) + 
-                          exploration_weight * math.sqrt(math.log(self.visits) / c.visits)
-        )
+    def state(self, node: int) -> Tuple[float, int, float]:
+        """(stock, day, total_cost) of the node, in InventoryState field order"""
+        return float(self.stock[node]), int(self.day[node]), float(self.cost[node])
+    
+    def next_action(self, node: int) -> int:
+        """Index into action_space of the node's next untried action"""
+        return int(self.n_children[node])
+    
+    def is_fully_expanded(self, node: int, width: Optional[int] = None) -> bool:
+        """True once the node has expanded `width` actions (default: all of them)"""
+        return self.n_children[node] >= (self.n_actions if width is None else min(width, self.n_actions))
+    
+    def best_child(self, node: int, exploration_weight: float = 1.414) -> int:
+        """Select child using UCB1 with virtual loss (pending visits count as zero reward)"""
+        kids = self.children[node, :self.n_children[node]]
+        if kids.size == 0:
+            # Safety valve if logic goes wrong, though logic below prevents this
+            return node
+        
+        n = self.visits.take(kids)
+        n += self.n_hat.take(kids)
+        scaled_sqrt_log_n = exploration_weight * math.sqrt(math.log(self.visits[node] + self.n_hat[node]))
+        scores = self.total_reward.take(kids)
+        scores /= n
+        scores += scaled_sqrt_log_n / np.sqrt(n)
+        return int(kids[scores.argmax()])
     
-    def add_child(self, action: float, state: InventoryState, action_space: List[float]) -> 'MCTSNode':
-        """Expand tree with new action"""
-        # FIX: Pass a COPY of the action space to the new child
-        child = MCTSNode(state, parent=self, action=action, untried_actions=list(action_space))
-        self.untried_actions.remove(action)
-        self.children.append(child)
+    def add_child(self, node: int, state: Tuple[float, int, float]) -> int:
+        """Expand the node's next untried action into state; returns the new child's index"""
+        child = self._store(state)
+        k = self.n_children[node]
+        self.children[node, k] = child
+        self.n_children[node] = k + 1
+        self.action_idx[child] = k
+        self.parent[child] = node
         return child
     
-    def update(self, reward: float):
-        """Backpropagate reward"""
-        self.visits += 1
-        self.total_reward += reward
+    def backpropagate(self, paths: np.ndarray, rewards: np.ndarray):
+        """Apply one visit and reward per (node, reward) pair, settling its pending virtual visit"""
+        np.add.at(self.visits, paths, 1.0)
+        np.add.at(self.total_reward, paths, rewards)
+        np.add.at(self.n_hat, paths, -1)
 
 
 class MCTSOptimizerAgent(BaseAgent):
@@ -93,24 +164,44 @@ class MCTSOptimizerAgent(BaseAgent):
     Minimizes total cost = holding_cost + stockout_cost
     """
     
+    # Random-policy rollouts simulated per expanded leaf (averaged into one reward)
+    ROLLOUTS_PER_LEAF = 32
+    # Leaves selected (under virtual loss) and simulated together per batch
+    LEAF_BATCH_SIZE = 8
+    # (day, stock bucket) -> (reward sum, count) memo used to seed new nodes
+    STATE_CACHE_SIZE = 10_000
+    STATE_PRIOR_WEIGHT = 0.25
+    # Iterations between checks for a root ranking that can no longer change
+    EARLY_STOP_CHECK_INTERVAL = 100
+    # LLM interpretations keyed by prompt hash. Class-level so every
+    # agent instance shares it.
+    INTERPRETATION_CACHE_SIZE = 128
+    _interpretation_cache: "OrderedDict[bytes, str]" = OrderedDict()
+    
     def __init__(self):
         super().__init__(
             name="MCTSOptimizer",
             model=settings.MCTS_OPTIMIZER_MODEL,
             api_client=google_client
         )
+        # PCG64 generator for all demand/action sampling (faster than the legacy global RandomState)
+        self.rng = np.random.default_rng()
     
     async def process(self, request: AgentRequest) -> AgentResponse:
         try:
             # Extract parameters
-            if "dataset" not in request.context:
+            # Inline records are read as-is; otherwise the stored dataset is loaded by id
+            dataset = request.context.get("dataset")
+            if dataset is None and "dataset_id" in request.context:
+                dataset = await load_dataset(request.context["dataset_id"])
+            if dataset is None:
                 return AgentResponse(
                     agent_name=self.name,
                     success=False,
                     error="No dataset provided for optimization"
                 )
             
-            df = pd.DataFrame(request.context["dataset"])
+            columns = self._dataset_columns(dataset)
             
             # Get optimization parameters
             holding_cost = request.parameters.get("holding_cost", 5)  # ₹5 per unit per day
@@ -118,10 +209,10 @@ class MCTSOptimizerAgent(BaseAgent):
             horizon = request.parameters.get("horizon", 30)  # 30-day planning
             iterations = request.parameters.get("iterations", 2000)  # MCTS iterations
             
-            logger.info(f"Starting MCTS with {iterations} iterations, {horizon}-day horizon")
+            logger.info("Starting MCTS with {} iterations, {}-day horizon", iterations, horizon)
             
             # Extract demand data
-            demand_data = self._extract_demand(df)
+            demand_data = self._extract_demand(columns)
             
             if len(demand_data) == 0:
                 return AgentResponse(
@@ -131,12 +222,18 @@ class MCTSOptimizerAgent(BaseAgent):
                 )
             
             # Calculate current inventory level
-            current_stock = self._get_current_stock(df, demand_data)
+            current_stock = self._get_current_stock(columns, demand_data)
+            
+            # Demand moments, computed once and shared by MCTS and the Bullwhip metrics
+            demand_mean = float(demand_data.mean())
+            demand_variance = float(demand_data.var())
             
             # Run MCTS optimization
             optimal_solution = await self._run_mcts(
                 current_stock=current_stock,
                 demand_history=demand_data,
+                mean_demand=demand_mean,
+                std_demand=math.sqrt(demand_variance),
                 holding_cost=holding_cost,
                 stockout_cost=stockout_cost,
                 horizon=horizon,
@@ -150,7 +247,7 @@ class MCTSOptimizerAgent(BaseAgent):
             
             # Calculate Bullwhip effect
             bullwhip_metrics = self._calculate_bullwhip_effect(
-                demand_data, optimal_solution
+                demand_variance, optimal_solution
             )
             
             # Get LLM interpretation
@@ -171,7 +268,7 @@ class MCTSOptimizerAgent(BaseAgent):
                 },
                 "bullwhip_reduction": bullwhip_metrics,
                 "simulation_stats": {
-                    "iterations": iterations,
+                    "iterations": optimal_solution["iterations_run"],
                     "explored_states": optimal_solution["explored_states"],
                     "computation_time_ms": optimal_solution["computation_time_ms"],
                     "baseline_cost": float(baseline_cost),
@@ -180,7 +277,7 @@ class MCTSOptimizerAgent(BaseAgent):
                 "interpretation": interpretation
             }
             
-            logger.info(f"MCTS completed: {response_data['expected_savings']['percentage']:.1f}% savings")
+            logger.info("MCTS completed: {:.1f}% savings", response_data['expected_savings']['percentage'])
             
             return AgentResponse(
                 agent_name=self.name,
@@ -196,32 +293,56 @@ class MCTSOptimizerAgent(BaseAgent):
                 error=str(e)
             )
     
-    def _extract_demand(self, df: pd.DataFrame) -> np.ndarray:
+    def _dataset_columns(self, dataset) -> Mapping[str, Any]:
+        """
+        Column name -> values for a DataFrame, a list of records or a dict of lists.
+        A DataFrame already is such a mapping and is returned as-is, so only the
+        columns the optimizer reads are ever converted to arrays.
+        """
+        if isinstance(dataset, pd.DataFrame):
+            return dataset
+        if isinstance(dataset, dict):
+            return {name: list(values) for name, values in dataset.items()}
+        
+        names = dict.fromkeys(key for record in dataset for key in record)
+        return {name: [record.get(name) for record in dataset] for name in names}
+    
+    def _extract_demand(self, columns: Mapping[str, Any]) -> np.ndarray:
         """Extract demand/sales/quantity data"""
         # Look for common column names
         demand_cols = ['demand', 'sales', 'quantity', 'units_sold', 'qty']
         
         for col in demand_cols:
-            matching = [c for c in df.columns if col.lower() in c.lower()]
+            matching = [c for c in columns if col.lower() in str(c).lower()]
             if matching:
-                return df[matching[0]].dropna().values
+                values = np.asarray(columns[matching[0]], dtype=np.float64)
+                return values[~np.isnan(values)]
         
-        # Fallback: use first numeric column
+        # Fallback: use first numeric column (only this path needs pandas' dtype inference)
+        df = pd.DataFrame(columns)
         numeric_cols = df.select_dtypes(include=[np.number]).columns
         if len(numeric_cols) > 0:
             return df[numeric_cols[0]].dropna().values
         
         return np.array([])
     
-    def _get_current_stock(self, df: pd.DataFrame, demand_data: np.ndarray) -> float:
+    def _get_current_stock(self, columns: Mapping[str, Any], demand_data: np.ndarray) -> float:
         """Estimate current stock level"""
         # Look for stock/inventory column
         stock_cols = ['stock', 'inventory', 'current_stock', 'on_hand']
         
         for col in stock_cols:
-            matching = [c for c in df.columns if col.lower() in c.lower()]
+            matching = [c for c in columns if col.lower() in str(c).lower()]
             if matching:
-                return float(df[matching[0]].iloc[-1])
+                # Last non-null, finite value: CSVs often end in blank rows
+                try:
+                    values = np.asarray(columns[matching[0]], dtype=np.float64)
+                except (TypeError, ValueError):
+                    break
+                values = values[np.isfinite(values)]
+                if values.size > 0:
+                    return float(values[-1])
+                break
         
         # Fallback: assume 2x average demand
         return float(np.mean(demand_data) * 2)
@@ -230,6 +351,8 @@ class MCTSOptimizerAgent(BaseAgent):
         self,
         current_stock: float,
         demand_history: np.ndarray,
+        mean_demand: float,
+        std_demand: float,
         holding_cost: float,
         stockout_cost: float,
         horizon: int,
@@ -239,91 +362,157 @@ class MCTSOptimizerAgent(BaseAgent):
         import time
         start_time = time.time()
         
-        logger.info(f"MCTS Debug: Stock={current_stock}, Holding=${holding_cost}, Stockout=${stockout_cost}")
+        logger.debug("MCTS Debug: Stock={}, Holding=${}, Stockout=${}", current_stock, holding_cost, stockout_cost)
 
         # Define action space
-        mean_demand = float(np.mean(demand_history))
-        std_demand = float(np.std(demand_history))
-        
         # Action space: 0, plus steps up to 3x demand
         action_space = [0.0] + list(np.linspace(0.1, mean_demand * 3, 10))
-        action_space = sorted(list(set([float(a) for a in action_space])))
+        action_space = tuple(sorted(set([float(a) for a in action_space])))
+        # Shared by every node: a node's untried actions are action_space[n_children:],
+        # so nothing per node is copied or searched on expansion
+        action_values = np.array(action_space)
         
         # Calculate Max Penalty for Normalization (Crucial for MCTS)
         # Max possible cost = Stockout every day for max demand
         max_penalty = stockout_cost * (mean_demand * 2) * horizon
         if max_penalty == 0: max_penalty = 1.0 # Prevent div/0
 
+        # Every iteration expands at most one node
         root_state = InventoryState(current_stock=current_stock, day=0)
-        root = MCTSNode(root_state, untried_actions=list(action_space))
+        tree = MCTSTree(capacity=iterations + 1, n_actions=len(action_space), root_state=root_state)
         
         explored_states = 0
         
-        for i in range(iterations):
-            node = root
-            state = InventoryState(current_stock=current_stock, day=0)
-            
-            # Selection
-            while node.is_fully_expanded() and not state.is_terminal(horizon):
-                if not node.children: break
-                node = node.best_child()
-                demand = self._sample_demand(demand_history)
-                state = state.transition(node.action, demand, holding_cost, stockout_cost)
+        # Rollout statistics of near-identical states, keyed by (day, stock bucket).
+        # Only used as a down-weighted prior for new children, never as an exact value.
+        state_cache: Dict[Tuple[int, int], Tuple[float, int]] = {}
+        bucket_width = max(1.0, mean_demand * 0.1)
+        
+        def state_key(s: Tuple[float, int, float]) -> Tuple[int, int]:
+            return (s[1], int(s[0] / bucket_width))
+        
+        transition = _make_transition(holding_cost, stockout_cost)
+        
+        # Pre-drawn demand samples for expansion transitions (at most one per iteration)
+        demand_pool = self.rng.choice(demand_history, size=iterations).tolist()
+        pool_idx = 0
+        
+        completed = 0
+        next_stop_check = self.EARLY_STOP_CHECK_INTERVAL
+        
+        while completed < iterations:
+            batch_size = min(self.LEAF_BATCH_SIZE, iterations - completed)
+            leaf_states = []
+            paths = []
             
-            # Expansion
-            if not state.is_terminal(horizon) and not node.is_fully_expanded():
-                action = node.untried_actions[0]
-                demand = self._sample_demand(demand_history)
-                new_state = state.transition(action, demand, holding_cost, stockout_cost)
-                node = node.add_child(action, new_state, action_space)
-                state = new_state
-                explored_states += 1
+            for _ in range(batch_size):
+                node = 0
+                tree.n_hat[node] += 1
+                path = [node]
+                # Progressive widening: the root opens only ceil(sqrt(N)) of its actions
+                root_width = math.ceil(math.sqrt(tree.visits[0] + tree.n_hat[0]))
+                
+                # Selection: walk the stored tree only; states were fixed at expansion
+                while tree.is_fully_expanded(node, root_width if node == 0 else None) and tree.day[node] < horizon:
+                    if tree.n_children[node] == 0: break
+                    node = tree.best_child(node)
+                    tree.n_hat[node] += 1
+                    path.append(node)
+                
+                state = tree.state(node)
+                
+                # Expansion (each node hands out its untried actions in order, so no
+                # two descents in this batch can expand the same (node, action))
+                if state[1] < horizon and not tree.is_fully_expanded(node, root_width if node == 0 else None):
+                    demand = demand_pool[pool_idx]
+                    pool_idx += 1
+                    state = transition(*state, action_space[tree.next_action(node)], demand)
+                    node = tree.add_child(node, state)
+                    tree.n_hat[node] += 1
+                    path.append(node)
+                    cached = state_cache.get(state_key(state))
+                    if cached is not None:
+                        tree.total_reward[node] = cached[0] * self.STATE_PRIOR_WEIGHT
+                        tree.visits[node] = cached[1] * self.STATE_PRIOR_WEIGHT
+                    explored_states += 1
+                
+                leaf_states.append(state)
+                paths.append(path)
             
-            # Simulation
-            sim_state = InventoryState(state.current_stock, state.day, state.total_cost)
-            while not sim_state.is_terminal(horizon):
-                action = np.random.choice(action_space)
-                demand = self._sample_demand(demand_history)
-                sim_state = sim_state.transition(action, demand, holding_cost, stockout_cost)
+            # Simulation: random-policy rollouts for every leaf of the batch in one NumPy pass
+            rows = batch_size * self.ROLLOUTS_PER_LEAF
+            start_stock, start_day, start_cost = (
+                np.repeat(column, self.ROLLOUTS_PER_LEAF) for column in zip(*leaf_states)
+            )
+            rollout_costs = start_cost + _rollout_kernel(
+                start_stock,
+                start_day,
+                self.rng.choice(action_values, size=(rows, horizon)),
+                self.rng.choice(demand_history, size=(rows, horizon)).astype(np.float64, copy=False),
+                float(holding_cost),
+                float(stockout_cost)
+            )
             
             # Backpropagation (With Normalization!)
             # Convert Cost to Reward [0, 1]
             # 1.0 = No Cost (Perfect), 0.0 = Max Cost (Disaster)
-            normalized_reward = 1.0 - (min(sim_state.total_cost, max_penalty) / max_penalty)
+            rewards = (1.0 - (np.minimum(rollout_costs, max_penalty) / max_penalty))
+            leaf_rewards = rewards.reshape(batch_size, self.ROLLOUTS_PER_LEAF).mean(axis=1)
+            
+            for state, reward in zip(leaf_states, leaf_rewards.tolist()):
+                key = state_key(state)
+                cached_sum, cached_count = state_cache.get(key, (0.0, 0))
+                if cached_count == 0 and len(state_cache) >= self.STATE_CACHE_SIZE:
+                    # FIFO eviction: dicts keep insertion order
+                    del state_cache[next(iter(state_cache))]
+                state_cache[key] = (cached_sum + reward, cached_count + 1)
+            
+            tree.backpropagate(
+                np.concatenate(paths),
+                np.repeat(leaf_rewards, [len(p) for p in paths])
+            )
+            
+            completed += batch_size
             
-            while node is not None:
-                node.update(normalized_reward)
-                node = node.parent
+            # Stop early once the runner-up could not catch the leader even if it
+            # won every remaining iteration
+            if completed >= next_stop_check and completed < iterations:
+                next_stop_check += self.EARLY_STOP_CHECK_INTERVAL
+                root_visits = np.sort(tree.visits[tree.children[0, :tree.n_children[0]]])
+                if root_visits.size >= 2 and root_visits[-1] - root_visits[-2] > iterations - completed:
+                    logger.info("MCTS early stop after {}/{} iterations", completed, iterations)
+                    break
         
         # Extract best action
-        if not root.children:
-             return {"reorder_point": 0, "order_quantity": 0, "safety_stock": 0, "expected_cost": 0, "explored_states": 0, "computation_time_ms": 0}
+        if tree.n_children[0] == 0:
+             return {"reorder_point": 0, "order_quantity": 0, "safety_stock": 0, "expected_cost": 0, "explored_states": 0, "iterations_run": completed, "computation_time_ms": 0}
 
         # Select child with highest visit count
-        best_child = max(root.children, key=lambda c: c.visits)
+        root_children = tree.children[0, :tree.n_children[0]]
+        best_child = int(root_children[np.argmax(tree.visits[root_children])])
+        best_action = action_space[tree.action_idx[best_child]]
+        best_visits = float(tree.visits[best_child])
+        best_avg_reward = float(tree.total_reward[best_child]) / best_visits
         
         # Log the winner for debugging
-        logger.info(f"MCTS Winner: Action={best_child.action:.1f}, Visits={best_child.visits}, AvgReward={best_child.total_reward/best_child.visits:.4f}")
+        logger.debug("MCTS Winner: Action={:.1f}, Visits={}, AvgReward={:.4f}", best_action, best_visits, best_avg_reward)
 
         computation_time = (time.time() - start_time) * 1000
         
         # De-normalize cost for display
         # Approximate expected cost based on inverse reward
-        expected_cost = (1.0 - (best_child.total_reward / best_child.visits)) * max_penalty
+        expected_cost = (1.0 - best_avg_reward) * max_penalty
 
         return {
             "reorder_point": mean_demand * 1.5,
-            "order_quantity": best_child.action,
+            "order_quantity": best_action,
             "safety_stock": std_demand * 1.65,
             "expected_cost": expected_cost,
             "explored_states": explored_states,
+            "iterations_run": completed,
             "computation_time_ms": computation_time
         }
         
-    def _sample_demand(self, demand_history: np.ndarray) -> float:
-        """Sample demand from historical distribution"""
-        return float(np.random.choice(demand_history))
-    
     def _calculate_baseline_cost(
         self,
         current_stock: float,
@@ -333,19 +522,11 @@ class MCTSOptimizerAgent(BaseAgent):
         horizon: int
     ) -> float:
         """Calculate cost with naive policy (no reordering)"""
-        state = InventoryState(current_stock=current_stock, day=0)
-        
-        for _ in range(horizon):
-            demand = self._sample_demand(demand_history)
-            state = state.transition(0, demand, holding_cost, stockout_cost)  # No orders
-        
-        return state.total_cost
+        demands = self.rng.choice(demand_history, size=horizon).astype(np.float64, copy=False)
+        return float(_baseline_cost_kernel(float(current_stock), demands, holding_cost, stockout_cost))
     
-    def _calculate_bullwhip_effect(self, demand_data: np.ndarray, solution: Dict) -> Dict:
+    def _calculate_bullwhip_effect(self, demand_variance: float, solution: Dict) -> Dict:
         """Calculate Bullwhip Effect metrics"""
-        # Demand variance
-        demand_variance = np.var(demand_data)
-        
         # Order variance (simplified: based on reorder policy)
         order_variance = solution["order_quantity"] ** 2 * 0.5  # Simplified
         
@@ -380,7 +561,7 @@ class MCTSOptimizerAgent(BaseAgent):
         prompt = f"""Interpret these inventory optimization results for an MSME owner:
 
 Results:
-{json.dumps(summary, indent=2)}
+{orjson.dumps(summary, option=orjson.OPT_INDENT_2).decode()}
 
 User Query: {query}
 
@@ -392,6 +573,12 @@ Explain in simple business terms:
 
 Keep it actionable and non-technical."""
         
+        # Same summary and query produce a byte-identical prompt; skip the round-trip
+        cache_key = hashlib.blake2b(f"{self.model}\n{prompt}".encode(), digest_size=16).digest()
+        cached = self._interpretation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             response = await self.api_client.generate_content(
                 model_name=self.model,
@@ -399,7 +586,15 @@ Keep it actionable and non-technical."""
                 temperature=0.6,
                 max_tokens=400
             )
-            return response.get("text", "Optimization complete. See recommendations above.")
+            text = response.get("text")
+            if not text:
+                return "Optimization complete. See recommendations above."
+            
+            self._interpretation_cache[cache_key] = text
+            if len(self._interpretation_cache) > self.INTERPRETATION_CACHE_SIZE:
+                self._interpretation_cache.popitem(last=False)  # FIFO eviction
+            
+            return text
         except Exception as e:
             logger.warning(f"LLM interpretation failed: {e}")
             return f"Recommended: {summary['recommended_action']}. Expected savings: {summary['cost_savings']}."
\ No newline at end of file
@@ -3,19 +3,107 @@
 from app.agents.base_agent import BaseAgent, AgentRequest, AgentResponse
 from app.core.api_clients import google_client
 from app.config import get_settings
-import requests
-import json
+import asyncio
+import httpx
+import orjson
 from datetime import datetime
+from typing import List, Optional, Set, Tuple
 from loguru import logger
 
 settings = get_settings()
 
+# Shared across NotifierAgent instances so the webhook host's TCP/TLS
+# connections are kept alive and reused
+_discord_client: Optional[httpx.AsyncClient] = None
+
+
+def get_discord_client() -> httpx.AsyncClient:
+    global _discord_client
+    if _discord_client is None or _discord_client.is_closed:
+        _discord_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(5.0),
+            limits=httpx.Limits(max_connections=10, keepalive_expiry=30.0)
+        )
+    return _discord_client
+
+
+async def close_discord_client():
+    global _discord_client
+    if _discord_client is not None:
+        await _discord_client.aclose()
+        _discord_client = None
+
+
+# Quick notifications are coalesced: embeds queued within QUICK_FLUSH_DELAY
+# seconds go out together, up to DISCORD_MAX_EMBEDS per webhook POST
+_pending_embeds: List[Tuple[dict, asyncio.Future]] = []
+_flush_task: Optional[asyncio.Task] = None
+_post_tasks: Set[asyncio.Task] = set()  # Strong refs so in-flight posts aren't garbage collected
+
+
+async def _post_embeds(batch: List[Tuple[dict, asyncio.Future]]):
+    """Send one webhook POST for the batch and resolve each caller's future with the outcome"""
+    try:
+        response = await get_discord_client().post(
+            settings.DISCORD_WEBHOOK_URL,
+            content=orjson.dumps({"embeds": [embed for embed, _ in batch]}),
+            headers={"Content-Type": "application/json"}
+        )
+        success = response.is_success
+    except Exception as e:
+        logger.warning(f"Discord webhook request failed: {e}")
+        success = False
+    
+    for _, future in batch:
+        if not future.done():
+            future.set_result(success)
+
+
+async def _flush_pending_embeds(delay: float):
+    global _flush_task
+    await asyncio.sleep(delay)
+    _flush_task = None
+    batch = _pending_embeds[:]
+    _pending_embeds.clear()
+    for i in range(0, len(batch), NotifierAgent.DISCORD_MAX_EMBEDS):
+        await _post_embeds(batch[i:i + NotifierAgent.DISCORD_MAX_EMBEDS])
+
+
 class NotifierAgent(BaseAgent):
     """
     Send notifications via Discord webhooks.
     Strictly gates execution to ensure it only runs after valid Order Generation.
     """
     
+    NOTIFICATION_TITLES = {
+        "info": "ℹ️ AURA Update",
+        "success": "✅ Order Placed",
+        "warning": "⚠️ Inventory Warning",
+        "alert": "🚨 Inventory Alert",
+        "summary": "📊 AURA Summary"
+    }
+    NOTIFICATION_COLORS = {
+        "info": 0x4A90E2,
+        "success": 0x2ECC71,
+        "warning": 0xF5A623,
+        "alert": 0xE74C3C,
+        "summary": 0x9B59B6
+    }
+    # Fixed-format alerts are filled from a template and go out through the
+    # coalescing queue; only summary-style messages are written by the LLM
+    MESSAGE_TEMPLATES = {
+        "info": "📢 Update: {event}",
+        "success": "✅ Purchase order drafted: {event}",
+        "warning": "⚠️ Inventory warning: {event}",
+        "alert": "🚨 Inventory alert: {event}"
+    }
+    LLM_MESSAGE_TYPES = frozenset({"summary"})
+    # Discord API limits
+    DISCORD_CONTENT_LIMIT = 2000
+    EMBED_DESCRIPTION_LIMIT = 4096
+    DISCORD_MAX_EMBEDS = 10
+    QUICK_FLUSH_DELAY = 0.25
+    
     def __init__(self):
         super().__init__(
             name="Notifier",
@@ -28,7 +116,7 @@ class NotifierAgent(BaseAgent):
         try:
             # --- GUARDRAIL: Check Prerequisites ---
             # The Orchestrator should prevent this, but the Agent acts as a second line of defense.
-            if "order_manager_output" not in request.context:
+            if "order_manager" not in request.dependency_outputs:
                 logger.warning("Notifier Triggered without Order Output. Skipping execution.")
                 return AgentResponse(
                     agent_name=self.name,
@@ -42,14 +130,22 @@ class NotifierAgent(BaseAgent):
             # Generate message content
             message_content = await self._generate_message(request.query, notification_type)
             
-            # Create embed data if context provided
-            embed_data = self._create_embed(notification_type, request.context)
+            # Create embed data from the order (and optimization) outputs
+            embed_data = self._create_embed(notification_type, request.dependency_outputs)
             
             # Send to Discord
-            success = self._send_discord_notification(
-                message=message_content,
-                embed=embed_data
-            )
+            if notification_type in self.LLM_MESSAGE_TYPES:
+                success = await self._send_discord_notification(
+                    message=message_content,
+                    embed=embed_data
+                )
+            else:
+                # Batched payloads carry embeds only, so the message leads the description
+                description = embed_data.get("description")
+                embed_data["description"] = (
+                    f"{message_content}\n\n{description}" if description else message_content
+                )[:self.EMBED_DESCRIPTION_LIMIT]
+                success = await self.send_quick_notification(message_content, notification_type, embed=embed_data)
             
             if not success:
                 logger.warning("Discord notification failed, falling back to log")
@@ -74,21 +170,103 @@ class NotifierAgent(BaseAgent):
             )
     
     async def _generate_message(self, query: str, notification_type: str) -> str:
-        # ... (Keep existing implementation) ...
-        # For brevity, reusing previous logic here
-        return f"📢 Update: {query}"
+        """Short Discord message: templated for fixed-format alerts, LLM-written for summaries"""
+        fallback = self.MESSAGE_TEMPLATES.get(notification_type, self.MESSAGE_TEMPLATES["info"])
+        fallback = fallback.format(event=query)[:self.DISCORD_CONTENT_LIMIT]
+        if notification_type not in self.LLM_MESSAGE_TYPES:
+            return fallback
+        
+        prompt = f"""Write a short Discord notification (max 2 sentences) for an MSME owner.
 
-    def _create_embed(self, notification_type: str, context: dict) -> dict:
-        # ... (Keep existing implementation) ...
-        return {}
+Notification type: {notification_type}
+Event: {query}
 
-    def _send_discord_notification(self, message: str, embed: dict = None) -> bool:
-        # ... (Keep existing implementation) ...
+Be direct and specific. No greetings."""
+        
+        try:
+            response = await self.api_client.generate_content(
+                model_name=self.model,
+                prompt=prompt,
+                temperature=0.3,
+                max_tokens=150
+            )
+            text = response.get("text", "").strip()
+            if text:
+                return text[:self.DISCORD_CONTENT_LIMIT]
+        except Exception as e:
+            logger.warning(f"Notification message generation failed: {e}")
+        
+        return fallback
+
+    def _get_title(self, notification_type: str) -> str:
+        return self.NOTIFICATION_TITLES.get(notification_type, self.NOTIFICATION_TITLES["info"])
+
+    def _create_embed(self, notification_type: str, upstream: dict) -> dict:
+        """Discord embed summarizing the order (and the optimization behind it, if present)"""
+        embed = {
+            "title": self._get_title(notification_type),
+            "color": self.NOTIFICATION_COLORS.get(notification_type, self.NOTIFICATION_COLORS["info"]),
+            "timestamp": datetime.utcnow().isoformat(),
+            "fields": []
+        }
+        
+        order = upstream.get("order_manager") or {}
+        if order.get("plan"):
+            embed["description"] = order["plan"][:self.EMBED_DESCRIPTION_LIMIT]
+        
+        optimization = upstream.get("mcts_optimizer") or {}
+        action = optimization.get("optimal_action") or {}
+        if "order_quantity" in action:
+            embed["fields"].append({"name": "Order Quantity", "value": f"{action['order_quantity']:.0f} units", "inline": True})
+        if "reorder_point" in action:
+            embed["fields"].append({"name": "Reorder Point", "value": f"{action['reorder_point']:.0f} units", "inline": True})
+        savings = optimization.get("expected_savings") or {}
+        if "amount_inr" in savings:
+            embed["fields"].append({"name": "Expected Savings", "value": f"₹{savings['amount_inr']:,.0f}", "inline": True})
+        
+        return embed
+
+    @staticmethod
+    async def send_quick_notification(message: str, notification_type: str = "info", embed: Optional[dict] = None) -> bool:
+        """
+        Post a message (or a prebuilt embed) to the configured webhook without an LLM call.
+        Messages sent close together share one webhook POST; returns whether it succeeded.
+        """
+        global _flush_task
+        if not settings.DISCORD_WEBHOOK_URL: return False
+        
+        if embed is None:
+            embed = {
+                "title": NotifierAgent.NOTIFICATION_TITLES.get(notification_type, NotifierAgent.NOTIFICATION_TITLES["info"]),
+                "description": message[:NotifierAgent.EMBED_DESCRIPTION_LIMIT],
+                "color": NotifierAgent.NOTIFICATION_COLORS.get(notification_type, NotifierAgent.NOTIFICATION_COLORS["info"])
+            }
+        future = asyncio.get_running_loop().create_future()
+        _pending_embeds.append((embed, future))
+        
+        if len(_pending_embeds) >= NotifierAgent.DISCORD_MAX_EMBEDS:
+            # A full payload goes out now; anything queued later waits for the timer
+            batch = _pending_embeds[:NotifierAgent.DISCORD_MAX_EMBEDS]
+            del _pending_embeds[:NotifierAgent.DISCORD_MAX_EMBEDS]
+            task = asyncio.create_task(_post_embeds(batch))
+            _post_tasks.add(task)
+            task.add_done_callback(_post_tasks.discard)
+        elif _flush_task is None:
+            _flush_task = asyncio.create_task(_flush_pending_embeds(NotifierAgent.QUICK_FLUSH_DELAY))
+        
+        return await future
+
+    async def _send_discord_notification(self, message: str, embed: dict = None) -> bool:
         if not self.webhook_url: return False
         try:
             payload = {"content": message}
             if embed: payload["embeds"] = [embed]
-            requests.post(self.webhook_url, json=payload)
-            return True
-        except:
+            response = await get_discord_client().post(
+                self.webhook_url,
+                content=orjson.dumps(payload),
+                headers={"Content-Type": "application/json"}
+            )
+            return response.is_success
+        except Exception as e:
+            logger.warning(f"Discord webhook request failed: {e}")
             return False
\ No newline at end of file
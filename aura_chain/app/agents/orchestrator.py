@@ -1,14 +1,90 @@
 # app/agents/orchestrator.py
 
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, AsyncIterator, Tuple
 from app.agents.base_agent import BaseAgent, AgentRequest, AgentResponse
 from app.core.api_clients import google_client
+from app.core.memory import session_manager
+from app.core.observability import AgentMetrics
 from app.config import get_settings
 from loguru import logger
-import json
+import orjson
+import hashlib
+import asyncio
+import re
 
 settings = get_settings()
 
+
+class _JSONObjectScanner:
+    """Finds the first complete top-level JSON object in streamed text"""
+    
+    def __init__(self):
+        self.parts = []
+        self.size = 0
+        self.start = None
+        self.depth = 0
+        self.in_string = False
+        self.escaped = False
+    
+    def feed(self, text: str) -> Optional[str]:
+        """Returns the object's text once its closing brace arrives"""
+        offset = self.size
+        self.parts.append(text)
+        self.size += len(text)
+        for i, ch in enumerate(text):
+            if self.in_string:
+                if self.escaped:
+                    self.escaped = False
+                elif ch == "\\":
+                    self.escaped = True
+                elif ch == '"':
+                    self.in_string = False
+            elif self.start is None:
+                if ch == "{":
+                    self.start = offset + i
+                    self.depth = 1
+            elif ch == '"':
+                self.in_string = True
+            elif ch == "{":
+                self.depth += 1
+            elif ch == "}":
+                self.depth -= 1
+                if self.depth == 0:
+                    return "".join(self.parts)[self.start:offset + i + 1]
+        return None
+
+
+# Agents are stateless between requests, so one instance of each is shared
+# by every orchestration run; built on first use to keep imports lazy
+_agent_registry: Optional[Dict[str, BaseAgent]] = None
+_agent_registry_lock = asyncio.Lock()
+
+
+async def get_agent_registry() -> Dict[str, BaseAgent]:
+    global _agent_registry
+    if _agent_registry is None:
+        async with _agent_registry_lock:
+            if _agent_registry is None:
+                from app.agents.data_harvester import DataHarvesterAgent
+                from app.agents.visualizer import VisualizerAgent
+                from app.agents.trend_analyst import TrendAnalystAgent
+                from app.agents.forecaster import ForecasterAgent
+                from app.agents.mcts_optimizer import MCTSOptimizerAgent
+                from app.agents.order_manager import OrderManagerAgent
+                from app.agents.notifier import NotifierAgent
+
+                _agent_registry = {
+                    "data_harvester": DataHarvesterAgent(),
+                    "visualizer": VisualizerAgent(),
+                    "trend_analyst": TrendAnalystAgent(),
+                    "forecaster": ForecasterAgent(),
+                    "mcts_optimizer": MCTSOptimizerAgent(),
+                    "order_manager": OrderManagerAgent(),
+                    "notifier": NotifierAgent(),
+                }
+    return _agent_registry
+
+
 class OrchestratorAgent(BaseAgent):
     """
     Central orchestrator that interprets queries and routes to appropriate agents.
@@ -25,15 +101,62 @@ class OrchestratorAgent(BaseAgent):
         "notifier": "Sends alerts. Used ONLY after an order is created."
     }
     
+    # Context an agent reads from another agent's output, whether or not the
+    # plan lists it in depends_on (only applied when both are in the plan)
+    IMPLICIT_DEPENDENCIES = {
+        "notifier": ["order_manager"]
+    }
+    # Upstream outputs an agent reads when they exist, without waiting on them
+    OPTIONAL_INPUTS = {
+        "notifier": ["mcts_optimizer"]
+    }
+    
+    # Agents each mode may never run, whatever the LLM plans
+    _FORBIDDEN_AGENTS = {
+        "cold_start": frozenset({"data_harvester", "mcts_optimizer", "order_manager", "notifier", "forecaster"}),
+        "ad_hoc": frozenset({"notifier", "data_harvester"}),
+    }
+    
+    # Mode detection keywords
+    ORDER_KEYWORDS = ["order", "buy", "purchase", "procure"]
+    DEEP_KEYWORDS = ["optimize", "full analysis", "deep dive", "strategy", "forecast", "predict", "bullwhip", "inventory"]
+    # Precompiled so each query is scanned once in C rather than once per keyword
+    _ORDER_PATTERN = re.compile("|".join(map(re.escape, ORDER_KEYWORDS)), re.IGNORECASE)
+    _DEEP_DIVE_PATTERN = re.compile("|".join(map(re.escape, DEEP_KEYWORDS + ORDER_KEYWORDS)), re.IGNORECASE)
+    
+    # Fixed pipelines for the modes whose plan never varies; only ad_hoc needs the LLM.
+    # "{query}" in a task is replaced with the user's query.
+    _PLAN_TEMPLATES = {
+        "cold_start": [
+            {"agent": "trend_analyst", "task": "Analyze external market trends for: {query}", "parameters": {}, "depends_on": []},
+        ],
+        "deep_dive": [
+            {"agent": "data_harvester", "task": "Clean and validate the dataset for: {query}", "parameters": {}, "depends_on": []},
+            {"agent": "trend_analyst", "task": "Identify trends in the dataset relevant to: {query}", "parameters": {}, "depends_on": ["data_harvester"]},
+            {"agent": "forecaster", "task": "Forecast future demand for: {query}", "parameters": {}, "depends_on": ["trend_analyst"]},
+            {"agent": "mcts_optimizer", "task": "Optimize inventory decisions for: {query}", "parameters": {}, "depends_on": ["forecaster"]},
+        ],
+    }
+    # Appended to the deep_dive template when the user asks to order
+    _ORDER_STEPS = [
+        {"agent": "order_manager", "task": "Draft a purchase order for: {query}", "parameters": {}, "depends_on": ["mcts_optimizer"]},
+        {"agent": "notifier", "task": "Notify that a purchase order was drafted for: {query}", "parameters": {}, "depends_on": ["order_manager"]},
+    ]
+    
     def __init__(self):
         super().__init__(
             name="Orchestrator",
             model=settings.ORCHESTRATOR_MODEL,
             api_client=google_client
         )
+        # Has no per-request parts, so it is built once
+        self._system_prompt = self._build_system_prompt()
     
     def get_system_prompt(self) -> str:
         """System prompt with mode-aware routing rules"""
+        return self._system_prompt
+    
+    def _build_system_prompt(self) -> str:
         capabilities = "\n".join([
             f"- {name}: {desc}"
             for name, desc in self.AGENT_CAPABILITIES.items()
@@ -94,71 +217,166 @@ Respond in JSON:
     def _detect_mode(self, request: AgentRequest) -> str:
         """Programmatically detect the mode to enforce guardrails"""
         has_dataset = "dataset_id" in request.context or "dataset" in request.context
-        query = request.query.lower()
-        
-        # Keywords
-        order_keywords = ["order", "buy", "purchase", "procure"]
-        deep_keywords = ["optimize", "full analysis", "deep dive", "strategy", "forecast", "predict", "bullwhip", "inventory"]
         
         # 1. Cold Start: No data available
         if not has_dataset:
             return "cold_start"
             
         # 2. Deep Dive: Explicit complex request
-        if any(k in query for k in deep_keywords) or any(k in query for k in order_keywords):
+        if self._DEEP_DIVE_PATTERN.search(request.query):
             return "deep_dive"
             
         # 3. Ad-Hoc: Default for specific questions on existing data
         return "ad_hoc"
 
+    def _plan_from_template(self, mode: str, query: str) -> Dict:
+        """Build the fixed plan for a templated mode"""
+        steps = list(self._PLAN_TEMPLATES[mode])
+        if mode == "deep_dive" and self._ORDER_PATTERN.search(query):
+            steps += self._ORDER_STEPS
+        
+        execution_plan = [
+            {**step, "task": step["task"].format(query=query), "parameters": dict(step["parameters"]), "depends_on": list(step["depends_on"])}
+            for step in steps
+        ]
+        return {
+            "mode": mode,
+            "reasoning": f"Fixed {mode} pipeline template",
+            "agents": [step["agent"] for step in execution_plan],
+            "execution_plan": execution_plan
+        }
+    
+    def _plan_cache_key(self, mode: str, query: str, context: Dict[str, Any]) -> str:
+        """
+        Exact key: whitespace/case-normalized query plus the dataset it runs
+        against (its id, or the column names of an inline dataset), since the
+        plan's task text and parameters are specific to both
+        """
+        if "dataset_id" in context:
+            dataset = f"id:{context['dataset_id']}"
+        elif context.get("dataset"):
+            dataset = "columns:" + ",".join(map(str, context["dataset"][0].keys()))
+        else:
+            dataset = ""
+        normalized = " ".join(query.lower().split())
+        digest = hashlib.blake2b(f"{normalized}\n{dataset}".encode(), digest_size=16).hexdigest()
+        return f"plan_cache:{mode}:{digest}"
+    
+    async def _find_cached_plan(self, redis_client, key: str) -> Optional[Dict]:
+        entry = await redis_client.get(key)
+        return orjson.loads(entry) if entry else None
+    
+    async def _store_cached_plan(self, redis_client, key: str, plan: Dict):
+        await redis_client.set(key, orjson.dumps(plan), ex=settings.PLAN_CACHE_TTL)
+    
+    def _parse_plan_text(self, content: str) -> Optional[Dict]:
+        """Parse a complete plan response, stripping any markdown fence"""
+        # Slice between the fences by index rather than building split() lists
+        start = content.find("```json")
+        if start >= 0:
+            start += 7
+        else:
+            start = content.find("```")
+            if start >= 0:
+                start += 3
+        if start >= 0:
+            end = content.find("```", start)
+            content = content[start:end if end >= 0 else len(content)].strip()
+        
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            logger.error(f"Failed to parse Orchestrator JSON. Raw: {content}")
+            return None
+    
     async def process(self, request: AgentRequest) -> AgentResponse:
         try:
             # 1. Detect Mode Programmatically
             detected_mode = self._detect_mode(request)
             
+            # Fixed pipelines skip the LLM entirely
+            if detected_mode in self._PLAN_TEMPLATES:
+                plan = self._plan_from_template(detected_mode, request.query)
+                return AgentResponse(agent_name=self.name, success=True, data={"plan": plan})
+            
+            # The same query against the same dataset reuses a stored plan
+            redis_client = session_manager.redis_client
+            cache_key = None
+            if redis_client is not None:
+                try:
+                    cache_key = self._plan_cache_key(detected_mode, request.query, request.context)
+                    cached_plan = await self._find_cached_plan(redis_client, cache_key)
+                    AgentMetrics.record_plan_cache_lookup(detected_mode, cached_plan is not None)
+                    if cached_plan is not None:
+                        return AgentResponse(agent_name=self.name, success=True, data={"plan": cached_plan})
+                except Exception as e:
+                    logger.warning(f"Plan cache lookup failed: {e}")
+                    cache_key = None
+            
+            # Static instructions form a byte-identical prefix on every call so the
+            # provider's prefix caching can reuse it; only the context block varies
             prompt = f"""{self.get_system_prompt()}
+Generate the execution plan based on the Detected Mode constraints.
 
 CURRENT CONTEXT:
 - Detected Mode: {detected_mode.upper()}
 - Has Dataset: {"Yes" if "dataset_id" in request.context else "No"}
-- User Query: {request.query}
-
-Generate the execution plan based on the Detected Mode constraints."""
+- User Query: {request.query}"""
             
-            # 2. Call LLM
-            response = await self.api_client.generate_content(
+            # 2. Call LLM, streaming so we stop reading once the plan object closes
+            scanner = _JSONObjectScanner()
+            chunks = []
+            plan = None
+            stream = self.api_client.stream_content(
                 model_name=self.model,
                 prompt=prompt,
                 temperature=0.1,
                 max_tokens=2000
             )
-            
-            # 3. Parse Response
-            content = response.get("text", "{}")
-            if "```json" in content:
-                content = content.split("```json")[1].split("```")[0].strip()
-            elif "```" in content:
-                content = content.split("```")[1].split("```")[0].strip()
-            
             try:
-                plan = json.loads(content)
-            except json.JSONDecodeError:
-                logger.error(f"Failed to parse Orchestrator JSON. Raw: {content}")
+                try:
+                    async for chunk in stream:
+                        chunks.append(chunk)
+                        complete = scanner.feed(chunk)
+                        if complete is not None:
+                            plan = orjson.loads(complete)
+                            break
+                finally:
+                    # Also on errors and cancellation, so the Gemini stream never leaks
+                    await stream.aclose()
+            except Exception as e:
+                logger.warning(f"Streamed plan failed, falling back to a full response: {e}")
+                response = await self.api_client.generate_content(
+                    model_name=self.model,
+                    prompt=prompt,
+                    temperature=0.1,
+                    max_tokens=2000
+                )
+                chunks = [response.get("text", "{}")]
+                plan = None
+            
+            # 3. Parse Response (fallback: whole buffer)
+            if plan is None:
+                plan = self._parse_plan_text("".join(chunks) or "{}")
+            if plan is None:
                 return AgentResponse(agent_name=self.name, success=False, error="Failed to generate plan")
 
             # 4. ENFORCE GUARDRAILS
             agents = plan.get("agents", [])
             
-            if detected_mode == "cold_start":
-                forbidden = ["data_harvester", "mcts_optimizer", "order_manager", "notifier", "forecaster"]
+            forbidden = self._FORBIDDEN_AGENTS.get(detected_mode)
+            if forbidden:
                 agents = [a for a in agents if a not in forbidden]
                 
-            elif detected_mode == "ad_hoc":
-                if "notifier" in agents: agents.remove("notifier")
-                
             # Update the plan with the filtered list
             plan["agents"] = agents
             plan["mode"] = detected_mode
+            
+            if cache_key is not None and agents:
+                try:
+                    await self._store_cached_plan(redis_client, cache_key, plan)
+                except Exception as e:
+                    logger.warning(f"Plan cache store failed: {e}")
 
             return AgentResponse(
                 agent_name=self.name,
@@ -175,27 +393,30 @@ Generate the execution plan based on the Detected Mode constraints."""
         execution_plan: Dict[str, Any],
         request: AgentRequest
     ) -> List[AgentResponse]:
-        """Execute the agents sequentially based on the plan"""
-        responses = []
-        
-        # Lazy imports
-        from app.agents.data_harvester import DataHarvesterAgent
-        from app.agents.visualizer import VisualizerAgent
-        from app.agents.trend_analyst import TrendAnalystAgent
-        from app.agents.forecaster import ForecasterAgent
-        from app.agents.mcts_optimizer import MCTSOptimizerAgent
-        from app.agents.order_manager import OrderManagerAgent
-        from app.agents.notifier import NotifierAgent
-
-        agent_registry = {
-            "data_harvester": DataHarvesterAgent(),
-            "visualizer": VisualizerAgent(),
-            "trend_analyst": TrendAnalystAgent(),
-            "forecaster": ForecasterAgent(),
-            "mcts_optimizer": MCTSOptimizerAgent(),
-            "order_manager": OrderManagerAgent(),
-            "notifier": NotifierAgent(),
-        }
+        """Execute the agents based on the plan, returning responses in plan order"""
+        results = [item async for item in self._run_plan(execution_plan, request)]
+        return [response for _, response in sorted(results, key=lambda item: item[0])]
+    
+    async def stream_agents(
+        self,
+        execution_plan: Dict[str, Any],
+        request: AgentRequest
+    ) -> AsyncIterator[AgentResponse]:
+        """Execute the agents based on the plan, yielding each response as it finishes"""
+        async for _, response in self._run_plan(execution_plan, request):
+            yield response
+    
+    async def _run_plan(
+        self,
+        execution_plan: Dict[str, Any],
+        request: AgentRequest
+    ) -> AsyncIterator[Tuple[int, AgentResponse]]:
+        """
+        Steps whose dependencies are all satisfied run concurrently, one
+        dependency level at a time. Yields (plan position, response) in
+        completion order.
+        """
+        agent_registry = await get_agent_registry()
         
         # --- HELPER: Aggressive Normalization ---
         def normalize(name: str) -> str:
@@ -204,63 +425,98 @@ Generate the execution plan based on the Detected Mode constraints."""
 
         # Create lookup: {'dataharvester': 'data_harvester', ...}
         registry_lookup = {normalize(k): k for k in agent_registry.keys()}
+        allowed_agents = {normalize(a) for a in execution_plan.get("agents", [])}
         
-        completed_agents = set() # Stores normalized names of completed agents
-
+        # 1. Resolve steps and their dependencies (normalized names)
+        pending = []
         for step in execution_plan.get("execution_plan", []):
             raw_name = step["agent"]
             normalized_name = normalize(raw_name)
             
-            # 1. Resolve Agent Key
             if normalized_name not in registry_lookup:
                 logger.warning(f"Skipping unknown agent: {raw_name}")
                 continue
             
-            registry_key = registry_lookup[normalized_name] # e.g. "data_harvester"
-            
-            # 2. Guardrails Check
-            allowed_agents = {normalize(a) for a in execution_plan.get("agents", [])}
+            # Guardrails Check
             if normalized_name not in allowed_agents:
                 continue
-
-            # 3. Check Dependencies (ROBUST FIX)
-            raw_deps = step.get("depends_on", [])
-            relevant_deps = [d for d in raw_deps if normalize(d) in allowed_agents]
-            missing_deps = [d for d in relevant_deps if normalize(d) not in completed_agents]
             
-            if missing_deps:
-                logger.warning(f"Skipping {registry_key} due to missing dependencies: {missing_deps}")
-                continue
-
-            # 4. Execute
-            agent = agent_registry[registry_key]
-            
-            agent_req = AgentRequest(
-                query=step.get("task", request.query),
-                context=request.context,
-                session_id=request.session_id,
-                user_id=request.user_id,
-                parameters=step.get("parameters", {})
-            )
-            
-            response = await agent.execute_with_observability(agent_req)
+            registry_key = registry_lookup[normalized_name] # e.g. "data_harvester"
+            deps = {normalize(d) for d in step.get("depends_on", [])}
+            deps.update(normalize(d) for d in self.IMPLICIT_DEPENDENCIES.get(registry_key, []))
+            # Only wait on agents that are actually part of this plan (ROBUST FIX)
+            deps &= allowed_agents
+            deps.discard(normalized_name)
+            pending.append((step, normalized_name, registry_key, deps, len(pending)))
+        
+        # Bounds concurrent agents within a level, as each holds an LLM call open
+        semaphore = asyncio.Semaphore(settings.MAX_AGENTS_PARALLEL)
+        
+        async def run(registry_key: str, agent_request: AgentRequest) -> AgentResponse:
+            async with semaphore:
+                return await agent_registry[registry_key].execute_with_observability(agent_request)
+        
+        completed_agents = set() # Stores normalized names of completed agents
+        finished_agents = set() # Completed or failed
+        outputs = {} # registry_key -> response data of successful agents
+        
+        def inputs_for(registry_key: str, deps: set) -> Dict[str, Any]:
+            """Outputs of the agent's own dependencies only, not everything upstream"""
+            wanted = [registry_lookup[d] for d in deps] + self.OPTIONAL_INPUTS.get(registry_key, [])
+            return {key: outputs[key] for key in wanted if key in outputs}
+        
+        # 2. Execute level by level (Kahn's algorithm over depends_on)
+        while pending:
+            ready = [p for p in pending if p[3] <= finished_agents]
+            if not ready:
+                for _, _, registry_key, deps, _ in pending:
+                    logger.warning(f"Skipping {registry_key} due to missing dependencies: {sorted(deps - finished_agents)}")
+                break
+            pending = [p for p in pending if not p[3] <= finished_agents]
             
-            # --- CRITICAL UI FIX: OVERWRITE NAME ---
-            # Force the response name to match the registry key (snake_case)
-            # e.g., Change "DataHarvester" -> "data_harvester"
-            response.agent_name = registry_key 
-            # ---------------------------------------
+            runnable = []
+            for entry in ready:
+                normalized_name, registry_key, deps = entry[1:4]
+                failed_deps = deps - completed_agents
+                if failed_deps:
+                    logger.warning(f"Skipping {registry_key} due to missing dependencies: {sorted(failed_deps)}")
+                    finished_agents.add(normalized_name)
+                    continue
+                runnable.append(entry)
             
-            responses.append(response)
+            async def run_step(entry):
+                step, _, registry_key, deps, _ = entry
+                return entry, await run(registry_key, AgentRequest(
+                    query=step.get("task", request.query),
+                    context=request.context,
+                    session_id=request.session_id,
+                    user_id=request.user_id,
+                    parameters=step.get("parameters", {}),
+                    dependency_outputs=inputs_for(registry_key, deps)
+                ))
             
-            if response.success:
-                completed_agents.add(normalized_name)
-                if response.data:
-                    request.context[f"{registry_key}_output"] = response.data
-                    if registry_key == "order_manager":
-                        request.context["order_manager_output"] = response.data
-
-        return responses
+            tasks = [asyncio.ensure_future(run_step(entry)) for entry in runnable]
+            try:
+                for next_done in asyncio.as_completed(tasks):
+                    (_, normalized_name, registry_key, _, position), response = await next_done
+                    # --- CRITICAL UI FIX: OVERWRITE NAME ---
+                    # Force the response name to match the registry key (snake_case)
+                    # e.g., Change "DataHarvester" -> "data_harvester"
+                    response.agent_name = registry_key 
+                    # ---------------------------------------
+                    
+                    finished_agents.add(normalized_name)
+                    
+                    if response.success:
+                        completed_agents.add(normalized_name)
+                        if response.data:
+                            outputs[registry_key] = response.data
+                    
+                    yield position, response
+            finally:
+                # A consumer that stops early (e.g. a dropped stream) shouldn't leave agents running
+                for task in tasks:
+                    task.cancel()
 
 # Singleton
 orchestrator = OrchestratorAgent()
\ No newline at end of file
@@ -1,6 +1,7 @@
 from app.agents.base_agent import BaseAgent, AgentRequest, AgentResponse
 from app.core.api_clients import google_client
 from app.config import get_settings
+from app.utils.datasets import get_context_dataset
 import pandas as pd
 import numpy as np
 from scipy import stats
@@ -31,14 +32,13 @@ class TrendAnalystAgent(BaseAgent):
     
     async def process(self, request: AgentRequest) -> AgentResponse:
         try:
-            if "dataset" not in request.context:
+            df = await get_context_dataset(request.context)
+            if df is None:
                 return AgentResponse(
                     agent_name=self.name,
                     success=False,
                     error="No dataset provided for analysis"
                 )
-            
-            df = pd.DataFrame(request.context["dataset"])
             logger.info(f"Analyzing trends for dataset: {df.shape}")
             
             # 1. Internal statistical analysis
@@ -2,17 +2,24 @@
 from app.agents.base_agent import BaseAgent, AgentRequest, AgentResponse
 from app.core.api_clients import google_client
 from app.config import get_settings
+from app.core.redis_pool import get_redis
+from app.utils.datasets import get_context_dataset
 from typing import Dict
 import pandas as pd
 import plotly.graph_objects as go
 import plotly.express as px
 import json
+import hashlib
+import orjson
+from loguru import logger
 
 settings = get_settings()
 
 class VisualizerAgent(BaseAgent):
     """Creates visualizations using Gemini Flash"""
     
+    CHART_CACHE_TTL = 3600  # Matches the stored dataset's lifetime
+    
     def __init__(self):
         super().__init__(
             name="Visualizer",
@@ -38,15 +45,14 @@ Response format:
     
     async def process(self, request: AgentRequest) -> AgentResponse:
         try:
-            if "dataset" not in request.context:
+            df = await get_context_dataset(request.context)
+            if df is None:
                 return AgentResponse(
                     agent_name=self.name,
                     success=False,
                     error="No dataset provided"
                 )
             
-            df = pd.DataFrame(request.context["dataset"])
-            
             prompt = f"""{self.get_system_prompt()}
 
 Create a visualization for: {request.query}
@@ -68,16 +74,15 @@ Provide chart specification in JSON format."""
             
             chart_spec = json.loads(content)
             
-            # Generate chart using plotly
-            fig = self._create_chart(df, chart_spec)
+            rendered = await self._render_chart(df, chart_spec, request.context.get("dataset_id"))
             
             return AgentResponse(
                 agent_name=self.name,
                 success=True,
                 data={
                     "chart_spec": chart_spec,
-                    "chart_json": fig.to_json(),
-                    "chart_html": fig.to_html()
+                    "chart_json": rendered["json"],
+                    "chart_html": rendered["html"]
                 }
             )
             
@@ -88,6 +93,30 @@ Provide chart specification in JSON format."""
                 error=str(e)
             )
     
+    async def _render_chart(self, df: pd.DataFrame, spec: Dict, dataset_id=None) -> Dict[str, str]:
+        """Render the chart, reusing a cached render for the same stored dataset and spec"""
+        cache_key = None
+        if dataset_id:
+            spec_hash = hashlib.blake2b(orjson.dumps(spec, option=orjson.OPT_SORT_KEYS), digest_size=16).hexdigest()
+            cache_key = f"viz:{dataset_id}:{spec_hash}"
+            try:
+                cached = await get_redis().get(cache_key)
+                if cached:
+                    return orjson.loads(cached)
+            except Exception as e:
+                logger.warning(f"Chart cache lookup failed: {e}")
+        
+        fig = self._create_chart(df, spec)
+        # plotly.js from the CDN instead of inlining the multi-MB bundle in every response
+        rendered = {"json": fig.to_json(), "html": fig.to_html(include_plotlyjs='cdn')}
+        
+        if cache_key:
+            try:
+                await get_redis().setex(cache_key, self.CHART_CACHE_TTL, orjson.dumps(rendered))
+            except Exception as e:
+                logger.warning(f"Chart cache store failed: {e}")
+        return rendered
+    
     def _create_chart(self, df: pd.DataFrame, spec: Dict) -> go.Figure:
         """Create plotly chart from specification"""
         chart_type = spec.get("chart_type", "line")
@@ -17,26 +17,18 @@ async def run_analysis(request: AnalyticsRequest):
     """
     try:
         # Get dataset
-        import redis.asyncio as redis
-        from app.config import get_settings
-        import pandas as pd
+        from app.utils.datasets import load_dataset
         
-        settings = get_settings()
-        redis_client = await redis.from_url(settings.REDIS_URL)
-        data = await redis_client.get(f"dataset:{request.dataset_id}")
-        await redis_client.close()
-        
-        if not data:
+        # Loaded here to 404 early; the agent then reuses the cached frame
+        if await load_dataset(request.dataset_id) is None:
             raise HTTPException(404, "Dataset not found")
         
-        df = pd.read_json(data)
-        
         # Route to appropriate agent
         from app.agents.trend_analyst import TrendAnalystAgent
         from app.agents.forecaster import ForecasterAgent
         from app.agents.base_agent import AgentRequest
         
-        context = {"dataset": df.to_dict('records')}
+        context = {"dataset_id": request.dataset_id}
         
         if request.analysis_type == "trends":
             agent = TrendAnalystAgent()
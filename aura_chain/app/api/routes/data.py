@@ -2,14 +2,28 @@
 from fastapi import APIRouter, UploadFile, File, HTTPException
 from typing import List
 import pandas as pd
-import uuid
-import io
+import os
 import json
-import redis.asyncio as redis
-from app.config import get_settings
+import orjson
+from app.core.redis_pool import get_redis
+from app.utils.datasets import serialize_dataset, deserialize_dataset
+from app.utils.ids import uuid7
 
 router = APIRouter(prefix="/data", tags=["data"])
 
+def _parse_json(stream) -> pd.DataFrame:
+    # orjson parses in C; records lists and column dicts are both accepted, as with read_json
+    records = orjson.loads(stream.read())
+    return pd.DataFrame.from_records(records) if isinstance(records, list) else pd.DataFrame(records)
+
+# File extension -> parser reading straight from the upload's spooled file
+_PARSERS = {
+    ".csv": lambda stream: pd.read_csv(stream, engine='pyarrow'),
+    ".xlsx": pd.read_excel,
+    ".xls": pd.read_excel,
+    ".json": _parse_json,
+}
+
 def sanitize_dataframe_for_json(df: pd.DataFrame) -> pd.DataFrame:
     """
     Convert all non-JSON-serializable types to strings
@@ -40,36 +54,26 @@ async def upload_dataset(file: UploadFile = File(...)):
     FIX: Handle datetime columns properly
     """
     try:
-        content = await file.read()
-        
         # Detect file type and parse
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(content))
-        elif file.filename.endswith(('.xlsx', '.xls')):
-            df = pd.read_excel(io.BytesIO(content))
-        elif file.filename.endswith('.json'):
-            df = pd.read_json(io.BytesIO(content))
-        else:
+        parser = _PARSERS.get(os.path.splitext(file.filename)[1].lower())
+        if parser is None:
             raise HTTPException(400, "Unsupported file format")
         
+        # The body is already spooled to a temp file; parse from it rather than
+        # reading a second in-memory copy
+        df = parser(file.file)
+        
         # CRITICAL: Sanitize dataframe for JSON serialization
         df = sanitize_dataframe_for_json(df)
         
-        dataset_id = str(uuid.uuid4())
-        settings = get_settings()
+        dataset_id = str(uuid7())
         
         # Store in Redis
-        redis_client = await redis.from_url(settings.REDIS_URL)
-        
-        # Serialize to JSON with explicit orientation
-        json_data = df.to_json(orient='records')
-        
-        await redis_client.setex(
+        await get_redis().setex(
             f"dataset:{dataset_id}",
             3600,  # 1 hour TTL
-            json_data
+            serialize_dataset(df)
         )
-        await redis_client.close()
         
         print(f"✓ Uploaded dataset: {len(df)} rows, {len(df.columns)} columns")
         
@@ -90,18 +94,13 @@ async def upload_dataset(file: UploadFile = File(...)):
 async def get_dataset(dataset_id: str):
     """Retrieve dataset by ID"""
     try:
-        settings = get_settings()
-        redis_client = await redis.from_url(settings.REDIS_URL)
-        
         # Fetch data (comes back as bytes)
-        data = await redis_client.get(f"dataset:{dataset_id}")
-        await redis_client.close()
+        data = await get_redis().get(f"dataset:{dataset_id}")
         
         if not data:
             raise HTTPException(404, "Dataset not found")
         
-        # Parse JSON
-        df = pd.read_json(io.BytesIO(data), orient='records')
+        df = deserialize_dataset(data)
         
         return {
             "dataset_id": dataset_id,
@@ -1,4 +1,6 @@
 from fastapi import APIRouter
+from fastapi.responses import Response
+from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from datetime import datetime
 
 router = APIRouter(prefix="/health", tags=["health"])
@@ -15,72 +17,8 @@ async def health_check():
 @router.get("/metrics")
 async def get_metrics():
     """Prometheus metrics endpoint"""
-    from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
-    from fastapi.responses import Response
-    
+    # Set as a header: media_type would append a second charset to CONTENT_TYPE_LATEST
     return Response(
         content=generate_latest(),
-        media_type=CONTENT_TYPE_LATEST
+        headers={"Content-Type": CONTENT_TYPE_LATEST}
     )
-
-
-# app/main.py
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from contextlib import asynccontextmanager
-from app.config import get_settings
-from app.core.memory import session_manager, memory_manager
-from app.api.routes import orchestrator, data, analytics, health
-
-settings = get_settings()
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Startup and shutdown events"""
-    # Startup
-    await session_manager.initialize()
-    await memory_manager.initialize()
-    yield
-    # Shutdown
-    await session_manager.close()
-    await memory_manager.close()
-
-app = FastAPI(
-    title=settings.APP_NAME,
-    version=settings.APP_VERSION,
-    lifespan=lifespan
-)
-
-# CORS
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
-# Include routers
-app.include_router(orchestrator.router, prefix=settings.API_PREFIX)
-app.include_router(data.router, prefix=settings.API_PREFIX)
-app.include_router(analytics.router, prefix=settings.API_PREFIX)
-app.include_router(health.router, prefix=settings.API_PREFIX)
-
-@app.get("/")
-async def root():
-    """Root endpoint"""
-    return {
-        "service": settings.APP_NAME,
-        "version": settings.APP_VERSION,
-        "docs": f"{settings.API_PREFIX}/docs"
-    }
-
-if __name__ == "__main__":
-    import uvicorn
-    uvicorn.run(
-        "app.main:app",
-        host=settings.HOST,
-        port=settings.PORT,
-        reload=settings.DEBUG,
-        workers=settings.WORKERS
-    )
\ No newline at end of file
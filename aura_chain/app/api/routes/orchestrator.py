@@ -1,18 +1,15 @@
 # app/api/routes/orchestrator.py
 from fastapi import APIRouter, HTTPException
-from typing import Dict, Any
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from typing import Dict, Any, Tuple
 from pydantic import BaseModel
 from app.agents.orchestrator import orchestrator
-from app.agents.base_agent import AgentRequest
+from app.agents.base_agent import AgentRequest, AgentResponse
 from app.core.memory import session_manager, context_engineer
-import uuid
-import redis.asyncio as redis
-from app.config import get_settings
-import pandas as pd
-import io
+from app.utils.ids import uuid7
+import orjson
 
 router = APIRouter(prefix="/orchestrator", tags=["orchestrator"])
-settings = get_settings()
 
 class QueryRequest(BaseModel):
     query: str
@@ -28,66 +25,68 @@ class QueryResponse(BaseModel):
     success: bool
     error: str | None = None
 
-@router.post("/query", response_model=QueryResponse)
+async def _plan_query(request: QueryRequest) -> Tuple[AgentRequest, AgentResponse]:
+    """Resolve the session, build the agent context and get the orchestration plan"""
+    # Create or get session
+    if not request.session_id:
+        request.session_id = str(uuid7())
+        await session_manager.create_session(request.user_id, request.session_id)
+    
+    # Build context using memory
+    memory_context = await context_engineer.build_context(
+        session_id=request.session_id,
+        user_id=request.user_id,
+        current_query=request.query
+    )
+    
+    # Merge contexts (request context takes precedence)
+    context = {**memory_context, **request.context}
+    
+    # Create agent request
+    agent_request = AgentRequest(
+        query=request.query,
+        context=context,
+        session_id=request.session_id,
+        user_id=request.user_id,
+        parameters=request.parameters
+    )
+    
+    # Get orchestration plan
+    orchestrator_response = await orchestrator.execute_with_observability(
+        agent_request
+    )
+    return agent_request, orchestrator_response
+
+def _format_response(r: AgentResponse) -> Dict[str, Any]:
+    return {
+        "agent": r.agent_name,
+        "success": r.success,
+        "data": r.data,
+        "error": r.error
+    }
+
+async def _save_turns(session_id: str, query: str, agent_responses: list[AgentResponse]):
+    # Save both turns in one session write; two concurrent add_message calls
+    # would each rewrite the session and drop the other's message
+    response_content = "\n\n".join([
+        f"{r.agent_name}: {r.data if r.success else r.error}"
+        for r in agent_responses
+    ])
+    await session_manager.add_messages(session_id, [
+        {"role": "user", "content": query},
+        {"role": "assistant", "content": response_content}
+    ])
+
+@router.post("/query", response_model=QueryResponse, response_class=ORJSONResponse)
 async def process_query(request: QueryRequest):
     """
     Main endpoint: User submits query, orchestrator coordinates agents
     FIX: Properly handle session and dataset retrieval
     """
     try:
-        request_id = str(uuid.uuid4())
-        
-        # Create or get session
-        if not request.session_id:
-            request.session_id = str(uuid.uuid4())
-            await session_manager.create_session(request.user_id, request.session_id)
-        
-        # CRITICAL FIX: If dataset_id is provided, fetch and inject dataset
-        if "dataset_id" in request.context and "dataset" not in request.context:
-            dataset_id = request.context["dataset_id"]
-            try:
-                redis_client = await redis.from_url(settings.REDIS_URL)
-                data_bytes = await redis_client.get(f"dataset:{dataset_id}")
-                await redis_client.close()
-                
-                if data_bytes:
-                    # Parse dataset from Redis
-                    df = pd.read_json(io.BytesIO(data_bytes), orient='records')
-                    
-                    # CRITICAL FIX: Convert datetime columns to strings for JSON serialization
-                    for col in df.select_dtypes(include=['datetime64']).columns:
-                        df[col] = df[col].astype(str)
-                    
-                    request.context["dataset"] = df.to_dict('records')
-                    print(f"✓ Loaded dataset with {len(df)} rows and {len(df.columns)} columns")
-                else:
-                    print(f"⚠ Dataset {dataset_id} not found in Redis")
-            except Exception as e:
-                print(f"⚠ Error loading dataset: {e}")
-        
-        # Build context using memory
-        memory_context = await context_engineer.build_context(
-            session_id=request.session_id,
-            user_id=request.user_id,
-            current_query=request.query
-        )
+        request_id = str(uuid7())
         
-        # Merge contexts (request context takes precedence)
-        context = {**memory_context, **request.context}
-        
-        # Create agent request
-        agent_request = AgentRequest(
-            query=request.query,
-            context=context,
-            session_id=request.session_id,
-            user_id=request.user_id,
-            parameters=request.parameters
-        )
-        
-        # Get orchestration plan
-        orchestrator_response = await orchestrator.execute_with_observability(
-            agent_request
-        )
+        agent_request, orchestrator_response = await _plan_query(request)
         
         if not orchestrator_response.success:
             return QueryResponse(
@@ -103,40 +102,53 @@ async def process_query(request: QueryRequest):
         # Execute agents according to plan
         agent_responses = await orchestrator.route_to_agents(plan, agent_request)
         
-        # Save conversation to session
-        await session_manager.add_message(
-            request.session_id,
-            "user",
-            request.query
-        )
-        
-        # Format response
-        response_content = "\n\n".join([
-            f"{r.agent_name}: {r.data if r.success else r.error}"
-            for r in agent_responses
-        ])
-        
-        await session_manager.add_message(
-            request.session_id,
-            "assistant",
-            response_content
-        )
+        await _save_turns(request.session_id, request.query, agent_responses)
         
         return QueryResponse(
             request_id=request_id,
             orchestration_plan=plan,
-            agent_responses=[
-                {
-                    "agent": r.agent_name,
-                    "success": r.success,
-                    "data": r.data,
-                    "error": r.error
-                }
-                for r in agent_responses
-            ],
+            agent_responses=[_format_response(r) for r in agent_responses],
             success=True
         )
         
     except Exception as e:
         print(f"❌ Query error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=str(e))
+
+def _sse(event: str, data: Dict[str, Any]) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data, default=str) + b"\n\n"
+
+@router.post("/query/stream")
+async def stream_query(request: QueryRequest):
+    """
+    Same as /query, as server-sent events: the plan first, then each agent's
+    result as soon as it finishes instead of after the slowest one
+    """
+    request_id = str(uuid7())
+    try:
+        agent_request, orchestrator_response = await _plan_query(request)
+    except Exception as e:
+        print(f"❌ Query error: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        if not orchestrator_response.success:
+            yield _sse("error", {"request_id": request_id, "error": orchestrator_response.error})
+            return
+        
+        plan = orchestrator_response.data["plan"]
+        yield _sse("plan", {"request_id": request_id, "session_id": request.session_id, "orchestration_plan": plan})
+        
+        agent_responses = []
+        try:
+            async for r in orchestrator.stream_agents(plan, agent_request):
+                agent_responses.append(r)
+                yield _sse("agent", _format_response(r))
+            
+            await _save_turns(request.session_id, request.query, agent_responses)
+            yield _sse("done", {"request_id": request_id, "success": True})
+        except Exception as e:
+            print(f"❌ Query stream error: {str(e)}")
+            yield _sse("error", {"request_id": request_id, "error": str(e)})
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
\ No newline at end of file
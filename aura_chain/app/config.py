@@ -1,5 +1,6 @@
+from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict # Updated import for V2 compatibility
-from typing import Optional
+from typing import Final, List, Optional
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -8,11 +9,14 @@ class Settings(BaseSettings):
     APP_VERSION: str = "1.0.0"
     DEBUG: bool = False
     API_PREFIX: str = "/api/v1"
+    ALLOWED_ORIGINS: List[str] = ["http://localhost:5173", "http://127.0.0.1:5173"]  # JSON list in env
     
     # Server
     HOST: str = "0.0.0.0"
     PORT: int = 8000
-    WORKERS: int = 4
+    WORKERS: int = 4  # ~min(cpu_count, expected_qps / qps_per_worker); each has its own pools and caches
+    UVICORN_LOOP: str = "uvloop"
+    UVICORN_HTTP: str = "httptools"
     
     # API Keys
     ANTHROPIC_API_KEY: str
@@ -25,6 +29,10 @@ class Settings(BaseSettings):
     # Redis
     REDIS_URL: str = "redis://localhost:6379/0"
     REDIS_TTL: int = 3600  # 1 hour
+    REDIS_UNIX_SOCKET: Optional[str] = None  # e.g. /var/run/redis/redis.sock, overrides REDIS_URL
+    REDIS_MAX_CONNECTIONS: int = 64
+    REDIS_PROTOCOL: int = 3  # RESP3; set 2 for Redis < 6
+    MAX_SESSION_MESSAGES: int = 200  # Older messages are dropped
     
     # Storage
     UPLOAD_DIR: str = "./uploads"
@@ -40,15 +48,36 @@ class Settings(BaseSettings):
     ORDER_MANAGER_MODEL: str = "gpt-4o"
     NOTIFIER_MODEL: str = "gpt-4o-mini"
     
+    # Orchestrator plan cache (exact query + dataset)
+    PLAN_CACHE_TTL: int = 86400  # 24 hours
+    
+    # Exact response cache for Anthropic/OpenAI calls (temperature 0 only, unless ALWAYS)
+    LLM_CACHE_ALWAYS: bool = False
+    LLM_CACHE_TTL: int = 3600  # 1 hour
+    LLM_CACHE_MAX_ENTRIES: int = 1024  # In-process tier
+    
     # Timeouts & Limits
     API_TIMEOUT: int = 60
     MAX_TOKENS: int = 4000
     MAX_AGENTS_PARALLEL: int = 3
+    BLOCKING_IO_WORKERS: int = 64  # Threads for blocking SDK calls (Gemini)
+    
+    # Provider rate limits (requests per minute) and retries on 429/5xx
+    ANTHROPIC_RPM: int = 50
+    OPENAI_RPM: int = 500
+    GOOGLE_RPM: int = 300
+    API_MAX_RETRIES: int = Field(default=5, ge=1)  # Attempts per call, including the first
     
     # Observability
     LOG_LEVEL: str = "INFO"
     ENABLE_METRICS: bool = True
     ENABLE_TRACING: bool = True
+    OTLP_ENDPOINT: str = "localhost:4317"  # OTLP gRPC collector; spans go to stdout when DEBUG
+    # Span batching: larger queue and shorter delay so agent bursts aren't dropped
+    OTEL_BSP_MAX_QUEUE_SIZE: int = 4096
+    OTEL_BSP_SCHEDULE_DELAY_MILLIS: int = 1000
+    OTEL_BSP_MAX_EXPORT_BATCH_SIZE: int = 256
+    OTEL_BSP_EXPORT_TIMEOUT_MILLIS: int = 10000
     
     # Security
     SECRET_KEY: str
@@ -67,4 +96,7 @@ class Settings(BaseSettings):
 
 @lru_cache()
 def get_settings() -> Settings:
-    return Settings()
\ No newline at end of file
+    return Settings()
+
+# Module-level instance for direct import; get_settings() returns the same object
+settings: Final[Settings] = get_settings()
@@ -1,28 +1,173 @@
 # app/core/api_clients.py
+import anthropic
 from anthropic import AsyncAnthropic
+from anthropic.types import ContentBlock
 import google.generativeai as genai
+from google.api_core import exceptions as google_exceptions
+import openai
 from openai import AsyncOpenAI
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
+from collections import OrderedDict
+from functools import lru_cache
 import asyncio
+import hashlib
+import random
+import threading
+import time
+import httpx
+import orjson
 from loguru import logger
-from app.config import get_settings
+from app.config import settings
+from app.core.exceptions import RateLimitError
+from app.core.redis_pool import get_redis
+
+# One keep-alive HTTP/2 pool shared by the Anthropic and OpenAI SDKs, so
+# concurrent agent calls reuse warm TLS connections instead of each SDK's own
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+    timeout=settings.API_TIMEOUT
+)
+
+
+async def close_http_client():
+    await _http_client.aclose()
+
+
+class RateLimiter:
+    """Token bucket allowing `rate` requests per `period` seconds"""
+    
+    def __init__(self, rate: int, period: float = 60.0):
+        self.rate = rate
+        self.period = period
+        self._tokens = float(rate)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+    
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.rate, self._tokens + (now - self._updated) * self.rate / self.period)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * self.period / self.rate)
+    
+    async def __aenter__(self):
+        await self.acquire()
+    
+    async def __aexit__(self, *exc):
+        return False
+
+
+anthropic_limiter = RateLimiter(settings.ANTHROPIC_RPM)
+openai_limiter = RateLimiter(settings.OPENAI_RPM)
+google_limiter = RateLimiter(settings.GOOGLE_RPM)
+
+# Errors worth retrying: rate limits, timeouts, dropped connections and 5xx
+ANTHROPIC_RETRYABLE = (anthropic.RateLimitError, anthropic.APIConnectionError, anthropic.InternalServerError)
+OPENAI_RETRYABLE = (openai.RateLimitError, openai.APIConnectionError, openai.InternalServerError)
+GOOGLE_RETRYABLE = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.ServiceUnavailable,
+    google_exceptions.InternalServerError,
+    google_exceptions.DeadlineExceeded,
+)
+
+
+async def _call_with_retry(provider: str, limiter: RateLimiter, retryable: Tuple, call):
+    """Run `call` under the provider's rate limit, backing off with jitter on transient errors"""
+    for attempt in range(settings.API_MAX_RETRIES):
+        async with limiter:
+            try:
+                return await call()
+            except retryable as e:
+                if attempt == settings.API_MAX_RETRIES - 1:
+                    raise RateLimitError(f"{provider} request failed after {attempt + 1} attempts: {str(e)}") from e
+                delay = min(2 ** attempt + random.random(), 30)
+                logger.warning(f"{provider} transient error ({type(e).__name__}), retrying in {delay:.1f}s")
+        await asyncio.sleep(delay)
+
+
+class ResponseCache:
+    """Exact-match cache of LLM responses: in-process LRU in front of Redis"""
+    
+    def __init__(self, namespace: str):
+        self.namespace = namespace
+        self._local: "OrderedDict[str, bytes]" = OrderedDict()
+    
+    @staticmethod
+    def enabled(temperature: float, tools=None, tool_choice=None) -> bool:
+        # Only deterministic calls are safe to replay; tool calls may have side effects
+        if tools or tool_choice:
+            return False
+        return temperature == 0 or settings.LLM_CACHE_ALWAYS
+    
+    def key(self, model: str, system: Optional[str], messages: List[Dict], temperature: float, max_tokens: int) -> str:
+        payload = orjson.dumps(
+            {"m": model, "s": system, "msgs": messages, "t": round(temperature, 3), "n": max_tokens},
+            option=orjson.OPT_SORT_KEYS
+        )
+        return f"llm:{self.namespace}:{hashlib.blake2b(payload, digest_size=16).hexdigest()}"
+    
+    async def get(self, key: str) -> Optional[Dict[str, Any]]:
+        data = self._local.get(key)
+        if data is not None:
+            self._local.move_to_end(key)
+            return orjson.loads(data)
+        try:
+            data = await get_redis().get(key)
+        except Exception as e:
+            logger.debug(f"LLM cache read failed: {str(e)}")
+            return None
+        if data is None:
+            return None
+        self._remember(key, data)
+        return orjson.loads(data)
+    
+    async def set(self, key: str, value: Dict[str, Any]):
+        data = orjson.dumps(value)
+        self._remember(key, data)
+        try:
+            await get_redis().setex(key, settings.LLM_CACHE_TTL, data)
+        except Exception as e:
+            logger.debug(f"LLM cache write failed: {str(e)}")
+    
+    def _remember(self, key: str, data: bytes):
+        self._local[key] = data
+        self._local.move_to_end(key)
+        if len(self._local) > settings.LLM_CACHE_MAX_ENTRIES:
+            self._local.popitem(last=False)
 
-settings = get_settings()
 
 class AnthropicClient:
     def __init__(self):
-        self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY)
+        self.client = AsyncAnthropic(api_key=settings.ANTHROPIC_API_KEY, http_client=_http_client, max_retries=0)
         self.timeout = settings.API_TIMEOUT
+        self._cache = ResponseCache("anthropic")
     
     async def create_message(self, model, messages, max_tokens=4000, temperature=0.7, system=None, tools=None, tool_choice=None):
+        cache_key = None
+        if ResponseCache.enabled(temperature, tools, tool_choice):
+            cache_key = self._cache.key(model, system, messages, temperature, max_tokens)
+            hit = await self._cache.get(cache_key)
+            if hit is not None:
+                hit["content"] = [ContentBlock.model_validate(block) for block in hit["content"]]
+                return hit
+        
         try:
             kwargs = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
             if system: kwargs["system"] = system
             if tools: kwargs["tools"] = tools
             if tool_choice: kwargs["tool_choice"] = tool_choice
             
-            response = await self.client.messages.create(**kwargs)
-            return {
+            response = await _call_with_retry(
+                "Anthropic", anthropic_limiter, ANTHROPIC_RETRYABLE,
+                lambda: self.client.messages.create(**kwargs)
+            )
+            result = {
                 "content": response.content,
                 "model": response.model,
                 "role": response.role,
@@ -32,11 +177,16 @@ class AnthropicClient:
         except Exception as e:
             logger.error(f"Anthropic API error: {str(e)}")
             raise
+        
+        if cache_key:
+            await self._cache.set(cache_key, {**result, "content": [block.model_dump() for block in response.content]})
+        return result
 
     async def stream_message(self, model, messages, max_tokens=4000, temperature=0.7, system=None):
         try:
             kwargs = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
             if system: kwargs["system"] = system
+            await anthropic_limiter.acquire()
             async with self.client.messages.stream(**kwargs) as stream:
                 async for text in stream.text_stream:
                     yield text
@@ -44,12 +194,26 @@ class AnthropicClient:
             logger.error(f"Anthropic streaming error: {str(e)}")
             raise
 
+@lru_cache(maxsize=32)
+def _get_gemini_model(model_name: str, temperature: float, max_tokens: int) -> genai.GenerativeModel:
+    """GenerativeModel objects are immutable configs, so one per setting is reused"""
+    return genai.GenerativeModel(
+        model_name=model_name,
+        generation_config={
+            "temperature": temperature,
+            "max_output_tokens": max_tokens,
+        }
+    )
+
+
 class GoogleAIClient:
     """Wrapper for Google AI (Gemini) API"""
     
     def __init__(self):
         genai.configure(api_key=settings.GOOGLE_API_KEY)
         self.timeout = settings.API_TIMEOUT
+        # Identical requests already in flight, keyed by (model, prompt, temperature, max_tokens)
+        self._inflight: Dict[Tuple, asyncio.Task] = {}
     
     async def generate_content(
         self,
@@ -59,24 +223,37 @@ class GoogleAIClient:
         max_tokens: int = 4000,
         tools: Optional[List] = None
     ) -> Dict[str, Any]:
-        """Generate content with Gemini"""
+        """Generate content with Gemini, sharing one call between identical concurrent requests"""
+        if tools:
+            return await self._generate_content(model_name, prompt, temperature, max_tokens, tools)
+        
+        key = (model_name, prompt, temperature, max_tokens)
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._generate_content(model_name, prompt, temperature, max_tokens))
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shielded so one caller being cancelled doesn't cancel the others' call
+        return dict(await asyncio.shield(task))
+    
+    async def _generate_content(
+        self,
+        model_name: str,
+        prompt: str,
+        temperature: float,
+        max_tokens: int,
+        tools: Optional[List] = None
+    ) -> Dict[str, Any]:
         try:
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config={
-                    "temperature": temperature,
-                    "max_output_tokens": max_tokens,
-                }
-            )
-            
             if tools:
                 model = genai.GenerativeModel(model_name=model_name, tools=tools)
+            else:
+                model = _get_gemini_model(model_name, temperature, max_tokens)
             
-            # Run in executor for async
-            loop = asyncio.get_event_loop()
-            response = await loop.run_in_executor(
-                None,
-                lambda: model.generate_content(prompt)
+            # The SDK call blocks, so run it on a worker thread
+            response = await _call_with_retry(
+                "Google AI", google_limiter, GOOGLE_RETRYABLE,
+                lambda: asyncio.to_thread(model.generate_content, prompt)
             )
             
             # --- FIX: ROBUST TEXT EXTRACTION ---
@@ -102,16 +279,57 @@ class GoogleAIClient:
             # Return a safe fallback instead of crashing the agent
             return {"text": "Analysis temporarily unavailable due to API constraints.", "error": str(e)}
 
+    async def stream_content(
+        self,
+        model_name: str,
+        prompt: str,
+        temperature: float = 0.7,
+        max_tokens: int = 4000
+    ):
+        """Stream Gemini output text as it is generated"""
+        model = _get_gemini_model(model_name, temperature, max_tokens)
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        done = object()
+        
+        # The SDK stream is a blocking iterator, so drain it on a worker thread
+        def pump():
+            try:
+                for chunk in model.generate_content(prompt, stream=True):
+                    if stop.is_set():
+                        break
+                    try:
+                        text = chunk.text
+                    except ValueError:
+                        continue
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+                loop.call_soon_threadsafe(queue.put_nowait, done)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+        
+        await google_limiter.acquire()
+        worker = loop.run_in_executor(None, pump)
+        try:
+            while True:
+                item = await queue.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    logger.error(f"Google AI streaming error: {str(item)}")
+                    raise item
+                yield item
+        finally:
+            # Lets the caller stop early without leaving the worker generating
+            stop.set()
+            worker.add_done_callback(lambda f: f.exception())
+
     async def chat(self, model_name, messages, temperature=0.7, max_tokens=4000):
         try:
-            model = genai.GenerativeModel(
-                model_name=model_name,
-                generation_config={"temperature": temperature, "max_output_tokens": max_tokens}
-            )
-            chat = model.start_chat(history=[])
+            chat = _get_gemini_model(model_name, temperature, max_tokens).start_chat(history=[])
             for msg in messages[:-1]:
-                await asyncio.get_event_loop().run_in_executor(None, lambda: chat.send_message(msg["content"]))
-            response = await asyncio.get_event_loop().run_in_executor(None, lambda: chat.send_message(messages[-1]["content"]))
+                await asyncio.to_thread(chat.send_message, msg["content"])
+            response = await asyncio.to_thread(chat.send_message, messages[-1]["content"])
             
             try: text = response.text
             except ValueError: 
@@ -127,16 +345,27 @@ class GoogleAIClient:
 
 class OpenAIClient:
     def __init__(self):
-        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY)
+        self.client = AsyncOpenAI(api_key=settings.OPENAI_API_KEY, http_client=_http_client, max_retries=0)
         self.timeout = settings.API_TIMEOUT
+        self._cache = ResponseCache("openai")
     
     async def create_completion(self, model, messages, temperature=0.7, max_tokens=4000, tools=None, tool_choice=None):
+        cache_key = None
+        if ResponseCache.enabled(temperature, tools, tool_choice):
+            cache_key = self._cache.key(model, None, messages, temperature, max_tokens)
+            hit = await self._cache.get(cache_key)
+            if hit is not None:
+                return hit
+        
         try:
             kwargs = {"model": model, "messages": messages, "temperature": temperature, "max_tokens": max_tokens}
             if tools: kwargs["tools"] = tools
             if tool_choice: kwargs["tool_choice"] = tool_choice
-            response = await self.client.chat.completions.create(**kwargs)
-            return {
+            response = await _call_with_retry(
+                "OpenAI", openai_limiter, OPENAI_RETRYABLE,
+                lambda: self.client.chat.completions.create(**kwargs)
+            )
+            result = {
                 "content": response.choices[0].message.content,
                 "role": response.choices[0].message.role,
                 "finish_reason": response.choices[0].finish_reason,
@@ -146,9 +375,15 @@ class OpenAIClient:
         except Exception as e:
             logger.error(f"OpenAI API error: {str(e)}")
             raise
+        
+        # tool_calls is always None here, since tool requests bypass the cache
+        if cache_key:
+            await self._cache.set(cache_key, result)
+        return result
     
     async def stream_completion(self, model, messages, temperature=0.7, max_tokens=4000):
         try:
+            await openai_limiter.acquire()
             stream = await self.client.chat.completions.create(model=model, messages=messages, temperature=temperature, max_tokens=max_tokens, stream=True)
             async for chunk in stream:
                 if chunk.choices[0].delta.content: yield chunk.choices[0].delta.content
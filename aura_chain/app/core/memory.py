@@ -1,41 +1,45 @@
 # app/core/memory.py
 from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
-from pydantic import BaseModel
+from datetime import datetime, timezone
+import msgspec
 import redis.asyncio as redis
-import json
-from app.config import get_settings
+from app.core.redis_pool import get_redis
+import orjson
+import time
+from collections import OrderedDict
+from app.config import settings
 from loguru import logger
 
-settings = get_settings()
-
 # ==================== MODELS ====================
 
-class Message(BaseModel):
+# msgspec Structs rather than Pydantic models: these are decoded and encoded
+# on every chat turn, and only need typed decoding, not validation
+
+class Message(msgspec.Struct, gc=False):
     """Single message in conversation"""
     role: str  # 'user' or 'assistant'
     content: str
-    timestamp: datetime
+    # Nanoseconds since the epoch; older records carrying an ISO "timestamp"
+    # decode with this defaulted to the load time
+    timestamp_ns: int = msgspec.field(default_factory=time.time_ns)
     metadata: Optional[Dict[str, Any]] = None
 
-class Session(BaseModel):
+class Session(msgspec.Struct, kw_only=True):
     """Container for immediate conversation history"""
     session_id: str
     user_id: str
-    messages: List[Message] = []
-    created_at: datetime
-    last_activity: datetime
+    messages: List[Message] = msgspec.field(default_factory=list)
+    created_at_ns: int = msgspec.field(default_factory=time.time_ns)
+    last_activity_ns: int = msgspec.field(default_factory=time.time_ns)
     metadata: Optional[Dict[str, Any]] = None
     
     def add_message(self, role: str, content: str, metadata: Optional[Dict] = None):
         """Add message to session"""
-        self.messages.append(Message(
-            role=role,
-            content=content,
-            timestamp=datetime.utcnow(),
-            metadata=metadata
-        ))
-        self.last_activity = datetime.utcnow()
+        message = Message(role, content, time.time_ns(), metadata)
+        self.messages.append(message)
+        # Same cap as the Redis list, so long sessions don't grow without bound
+        del self.messages[:-settings.MAX_SESSION_MESSAGES]
+        self.last_activity_ns = message.timestamp_ns
     
     def get_context_window(self, max_messages: int = 20) -> List[Dict[str, str]]:
         """Get recent messages formatted for LLM context"""
@@ -45,31 +49,70 @@ class Session(BaseModel):
             for msg in recent
         ]
 
-class Memory(BaseModel):
+class Memory(msgspec.Struct, kw_only=True):
     """Long-term persistence across sessions"""
     user_id: str
-    facts: Dict[str, Any] = {}  # Extracted facts about user
-    preferences: Dict[str, Any] = {}  # User preferences
-    history_summary: List[str] = []  # Summarized past interactions
-    entities: Dict[str, Any] = {}  # Named entities (companies, products, etc.)
-    last_updated: datetime
+    facts: Dict[str, Any] = msgspec.field(default_factory=dict)  # Extracted facts about user
+    preferences: Dict[str, Any] = msgspec.field(default_factory=dict)  # User preferences
+    history_summary: List[str] = msgspec.field(default_factory=list)  # Summarized past interactions
+    entities: Dict[str, Any] = msgspec.field(default_factory=dict)  # Named entities (companies, products, etc.)
+    last_updated_ns: int = msgspec.field(default_factory=time.time_ns)
     
     def update_fact(self, key: str, value: Any):
         """Update or add a fact"""
         self.facts[key] = value
-        self.last_updated = datetime.utcnow()
+        self.last_updated_ns = time.time_ns()
     
     def update_preference(self, key: str, value: Any):
         """Update user preference"""
         self.preferences[key] = value
-        self.last_updated = datetime.utcnow()
+        self.last_updated_ns = time.time_ns()
     
     def add_entity(self, entity_type: str, entity_name: str, data: Dict[str, Any]):
         """Add or update entity"""
         if entity_type not in self.entities:
             self.entities[entity_type] = {}
         self.entities[entity_type][entity_name] = data
-        self.last_updated = datetime.utcnow()
+        self.last_updated_ns = time.time_ns()
+
+
+# ==================== CODEC ====================
+# Reads the same JSON the earlier orjson-encoded Pydantic models wrote
+
+_encoder = msgspec.json.Encoder()
+_message_decoder = msgspec.json.Decoder(Message)
+_memory_decoder = msgspec.json.Decoder(Memory)
+
+
+# ==================== LOCAL CACHE ====================
+
+class TTLCache:
+    """Small in-process LRU cache whose entries expire after ttl seconds"""
+    
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Any, tuple]" = OrderedDict()
+    
+    def get(self, key: Any) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        self._data.move_to_end(key)
+        return value
+    
+    def set(self, key: Any, value: Any):
+        self._data[key] = (time.monotonic() + self.ttl, value)
+        self._data.move_to_end(key)
+        if len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+    
+    def pop(self, key: Any):
+        self._data.pop(key, None)
 
 
 # ==================== SESSION MANAGER ====================
@@ -77,58 +120,110 @@ class Memory(BaseModel):
 class SessionManager:
     """Manages working memory within sessions"""
     
+    # Short-lived so other workers' writes show up quickly; local writes invalidate
+    CACHE_SIZE = 10_000
+    CACHE_TTL = 2  # seconds
+    
+    # Appends only if the session exists, checked and written in one atomic step.
+    # KEYS: meta, messages. ARGV: now_ns, max messages, ttl, encoded messages...
+    APPEND_MESSAGES_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 0
+end
+for i = 4, #ARGV do
+    redis.call('RPUSH', KEYS[2], ARGV[i])
+end
+redis.call('LTRIM', KEYS[2], -tonumber(ARGV[2]), -1)
+redis.call('EXPIRE', KEYS[2], ARGV[3])
+redis.call('HSET', KEYS[1], 'last_activity_ns', ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return 1
+"""
+    
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
+        self._append_messages = None
+        self._history_cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
     
     async def initialize(self):
         """Initialize Redis connection"""
-        self.redis_client = await redis.from_url(
-            settings.REDIS_URL,
-            encoding="utf-8",
-            decode_responses=True
-        )
+        self.redis_client = get_redis()
+        # Sent by EVALSHA, falling back to EVAL once per server script cache miss
+        self._append_messages = self.redis_client.register_script(self.APPEND_MESSAGES_SCRIPT)
     
     async def close(self):
         """Close Redis connection"""
         if self.redis_client:
             await self.redis_client.close()
     
-    def _session_key(self, session_id: str) -> str:
-        """Generate Redis key for session"""
-        return f"session:{session_id}"
+    # A session is split into a HASH of metadata and a LIST of messages, so
+    # appending a message writes only that message instead of the whole session
+    def _meta_key(self, session_id: str) -> str:
+        """Generate Redis key for session metadata"""
+        return f"session:{session_id}:meta"
+    
+    def _messages_key(self, session_id: str) -> str:
+        """Generate Redis key for session messages"""
+        return f"session:{session_id}:msgs"
+    
+    def _session_meta(self, session: Session) -> Dict[str, Any]:
+        meta = {
+            "session_id": session.session_id,
+            "user_id": session.user_id,
+            "created_at_ns": session.created_at_ns,
+            "last_activity_ns": session.last_activity_ns
+        }
+        if session.metadata is not None:
+            meta["metadata"] = orjson.dumps(session.metadata)
+        return meta
     
     async def create_session(self, user_id: str, session_id: str) -> Session:
         """Create new session"""
-        session = Session(
-            session_id=session_id,
-            user_id=user_id,
-            created_at=datetime.utcnow(),
-            last_activity=datetime.utcnow()
-        )
+        session = Session(session_id=session_id, user_id=user_id)
+        session.last_activity_ns = session.created_at_ns
         
-        await self.redis_client.setex(
-            self._session_key(session_id),
-            settings.REDIS_TTL,
-            session.model_dump_json()
-        )
+        meta_key = self._meta_key(session_id)
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hset(meta_key, mapping=self._session_meta(session))
+            pipe.expire(meta_key, settings.REDIS_TTL)
+            await pipe.execute()
         
         logger.info(f"Created session {session_id} for user {user_id}")
         return session
     
     async def get_session(self, session_id: str) -> Optional[Session]:
         """Retrieve session"""
-        data = await self.redis_client.get(self._session_key(session_id))
-        if data:
-            return Session.model_validate_json(data)
-        return None
+        async with self.redis_client.pipeline(transaction=False) as pipe:
+            pipe.hgetall(self._meta_key(session_id))
+            pipe.lrange(self._messages_key(session_id), 0, -1)
+            meta, messages = await pipe.execute()
+        
+        if not meta:
+            return None
+        meta = {key.decode(): value for key, value in meta.items()}
+        return Session(
+            session_id=meta["session_id"].decode(),
+            user_id=meta["user_id"].decode(),
+            created_at_ns=int(meta.get("created_at_ns", 0)),
+            last_activity_ns=int(meta.get("last_activity_ns", 0)),
+            metadata=orjson.loads(meta["metadata"]) if "metadata" in meta else None,
+            messages=[_message_decoder.decode(m) for m in messages]
+        )
     
     async def update_session(self, session: Session):
-        """Update session in Redis"""
-        await self.redis_client.setex(
-            self._session_key(session.session_id),
-            settings.REDIS_TTL,
-            session.model_dump_json()
-        )
+        """Rewrite the whole session in Redis"""
+        meta_key = self._meta_key(session.session_id)
+        messages_key = self._messages_key(session.session_id)
+        async with self.redis_client.pipeline(transaction=True) as pipe:
+            pipe.hset(meta_key, mapping=self._session_meta(session))
+            pipe.expire(meta_key, settings.REDIS_TTL)
+            pipe.delete(messages_key)
+            if session.messages:
+                recent = session.messages[-settings.MAX_SESSION_MESSAGES:]
+                pipe.rpush(messages_key, *[_encoder.encode(m) for m in recent])
+                pipe.expire(messages_key, settings.REDIS_TTL)
+            await pipe.execute()
+        self._history_cache.pop(session.session_id)
     
     async def add_message(
         self,
@@ -138,11 +233,30 @@ class SessionManager:
         metadata: Optional[Dict] = None
     ):
         """Add message to session"""
-        session = await self.get_session(session_id)
-        if session:
-            session.add_message(role, content, metadata)
-            await self.update_session(session)
-        else:
+        await self.add_messages(session_id, [{"role": role, "content": content, "metadata": metadata}])
+    
+    async def add_messages(self, session_id: str, messages: List[Dict[str, Any]]):
+        """Append messages to a session in a single round trip"""
+        now = time.time_ns()
+        encoded = [
+            _encoder.encode(Message(
+                role=message["role"],
+                content=message["content"],
+                timestamp_ns=now,
+                metadata=message.get("metadata")
+            ))
+            for message in messages
+        ]
+        
+        # Unknown or expired sessions are left untouched: no partial meta hash
+        # for a concurrent get_session to trip over, and no orphan message list
+        appended = await self._append_messages(
+            keys=[self._meta_key(session_id), self._messages_key(session_id)],
+            args=[now, settings.MAX_SESSION_MESSAGES, settings.REDIS_TTL, *encoded]
+        )
+        self._history_cache.pop(session_id)
+        
+        if not appended:
             logger.warning(f"Session {session_id} not found")
     
     async def get_conversation_history(
@@ -151,14 +265,22 @@ class SessionManager:
         max_messages: int = 20
     ) -> List[Dict[str, str]]:
         """Get conversation history for LLM context"""
-        session = await self.get_session(session_id)
-        if session:
-            return session.get_context_window(max_messages)
-        return []
+        cached = self._history_cache.get(session_id)
+        if cached is not None and cached[0] == max_messages:
+            return cached[1]
+        
+        messages = await self.redis_client.lrange(self._messages_key(session_id), -max_messages, -1)
+        history = [
+            {"role": msg.role, "content": msg.content}
+            for msg in (_message_decoder.decode(m) for m in messages)
+        ]
+        self._history_cache.set(session_id, (max_messages, history))
+        return history
     
     async def delete_session(self, session_id: str):
         """Delete session"""
-        await self.redis_client.delete(self._session_key(session_id))
+        await self.redis_client.delete(self._meta_key(session_id), self._messages_key(session_id))
+        self._history_cache.pop(session_id)
         logger.info(f"Deleted session {session_id}")
 
 
@@ -167,16 +289,16 @@ class SessionManager:
 class MemoryManager:
     """Manages long-term memory across sessions"""
     
+    CACHE_SIZE = 10_000
+    CACHE_TTL = 5  # seconds
+    
     def __init__(self):
         self.redis_client: Optional[redis.Redis] = None
+        self._memory_cache = TTLCache(self.CACHE_SIZE, self.CACHE_TTL)
     
     async def initialize(self):
         """Initialize Redis connection"""
-        self.redis_client = await redis.from_url(
-            settings.REDIS_URL,
-            encoding="utf-8",
-            decode_responses=True
-        )
+        self.redis_client = get_redis()
     
     async def close(self):
         """Close Redis connection"""
@@ -189,15 +311,23 @@ class MemoryManager:
     
     async def get_memory(self, user_id: str) -> Memory:
         """Retrieve or create user memory"""
+        memory = self._memory_cache.get(user_id)
+        if memory is not None:
+            return memory
+        
         data = await self.redis_client.get(self._memory_key(user_id))
         if data:
-            return Memory.model_validate_json(data)
+            memory = _memory_decoder.decode(data)
+            if b'"last_updated_ns"' not in data:
+                # Legacy record: last_updated_ns was defaulted to now, so persist it
+                # once, or every load would look like a new revision
+                await self.save_memory(memory)
+            else:
+                self._memory_cache.set(user_id, memory)
+            return memory
         
         # Create new memory
-        memory = Memory(
-            user_id=user_id,
-            last_updated=datetime.utcnow()
-        )
+        memory = Memory(user_id=user_id)
         await self.save_memory(memory)
         return memory
     
@@ -205,8 +335,9 @@ class MemoryManager:
         """Persist memory to Redis"""
         await self.redis_client.set(
             self._memory_key(memory.user_id),
-            memory.model_dump_json()
+            _encoder.encode(memory)
         )
+        self._memory_cache.set(memory.user_id, memory)
     
     async def update_from_conversation(
         self,
@@ -263,7 +394,8 @@ class MemoryManager:
         message_count = len(session.messages)
         topics = []  # Extract topics from messages
         
-        summary = f"Session on {session.created_at.date()}: {message_count} messages exchanged"
+        created = datetime.fromtimestamp(session.created_at_ns / 1e9, tz=timezone.utc)
+        summary = f"Session on {created.date()}: {message_count} messages exchanged"
         
         memory = await self.get_memory(user_id)
         memory.history_summary.append(summary)
@@ -335,7 +467,7 @@ class ContextEngineer:
         
         if context.get("known_entities"):
             prompt_parts.append(
-                f"Known entities: {json.dumps(context['known_entities'], indent=2)}"
+                f"Known entities: {orjson.dumps(context['known_entities'], option=orjson.OPT_INDENT_2).decode()}"
             )
         
         return "\n\n".join(prompt_parts)
@@ -1,17 +1,17 @@
 # app/core/observability.py
 from loguru import logger
 from typing import Dict, Any, Optional
-from datetime import datetime
 from enum import Enum
-import json
+import orjson
 import sys
-from functools import wraps
+from functools import lru_cache, wraps
 import time
 from prometheus_client import Counter, Histogram, Gauge
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider
-from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter, SpanExporter
 from app.config import get_settings
+from app.models.schemas import ModelProvider
 
 settings = get_settings()
 
@@ -25,9 +25,44 @@ class LogLevel(Enum):
     ERROR = "ERROR"
     CRITICAL = "CRITICAL"
 
+CONSOLE_FORMAT = "<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> | <level>{message}</level>"
+
+
+def _console_format(record) -> str:
+    # Structured details are bound to the record, pre-serialized, rather than baked into the message
+    if "details_json" in record["extra"]:
+        return CONSOLE_FORMAT + " {extra[details_json]}\n{exception}"
+    return CONSOLE_FORMAT + "\n{exception}"
+
+
+def _json_format(record) -> str:
+    """One orjson pass per line, in place of loguru's serialize=True (stdlib json over the full record)"""
+    line = {
+        "time": record["time"].isoformat(),  # loguru's datetime subclass isn't native to orjson
+        "level": record["level"].name,
+        "name": record["name"],
+        "function": record["function"],
+        "line": record["line"],
+        "message": record["message"],
+    }
+    line.update((k, v) for k, v in record["extra"].items() if k not in ("json", "details_json"))
+    if record["exception"] is not None:
+        line["exception"] = repr(record["exception"].value)
+    payload = orjson.dumps(line, default=str).decode()
+    details_json = record["extra"].get("details_json")
+    if details_json is not None:
+        # Splice the already-serialized details in as a nested object
+        payload = f'{payload[:-1]},"details":{details_json}}}'
+    record["extra"]["json"] = payload
+    return "{extra[json]}\n"
+
+
 class AgentLogger:
     """Structured logger for agent activities"""
     
+    # loguru opens file sinks line-buffered, i.e. one write() per record
+    FILE_BUFFER_SIZE = 65536
+    
     def __init__(self):
         self._configure_logger()
     
@@ -38,7 +73,7 @@ class AgentLogger:
         # Console handler with pretty formatting
         logger.add(
             sys.stdout,
-            format="<green>{time:YYYY-MM-DD HH:mm:ss}</green> | <level>{level: <8}</level> | <cyan>{name}</cyan>:<cyan>{function}</cyan> | <level>{message}</level>",
+            format=_console_format,
             level=settings.LOG_LEVEL
         )
         
@@ -47,9 +82,13 @@ class AgentLogger:
             "logs/agent_platform_{time}.log",
             rotation="500 MB",
             retention="10 days",
-            format="{time:YYYY-MM-DD HH:mm:ss} | {level} | {name}:{function} | {message}",
+            format=_json_format,
             level=settings.LOG_LEVEL,
-            serialize=True  # JSON format
+            # Buffered so records coalesce into large writes. No enqueue: it would
+            # pickle every record (and its bound extras) across a queue, which
+            # costs more than the occasional 64 KB write it moves off the loop.
+            # loguru's atexit handler removes sinks, flushing what's buffered.
+            buffering=self.FILE_BUFFER_SIZE
         )
     
     def log_agent_activity(
@@ -60,25 +99,12 @@ class AgentLogger:
         level: LogLevel = LogLevel.INFO
     ):
         """Log structured agent activity"""
-        log_data = {
-            "timestamp": datetime.utcnow().isoformat(),
-            "agent": agent_name,
-            "activity": activity,
-            "details": details
-        }
-        
-        log_message = f"[{agent_name}] {activity}: {json.dumps(details)}"
-        
-        if level == LogLevel.DEBUG:
-            logger.debug(log_message)
-        elif level == LogLevel.INFO:
-            logger.info(log_message)
-        elif level == LogLevel.WARNING:
-            logger.warning(log_message)
-        elif level == LogLevel.ERROR:
-            logger.error(log_message)
-        elif level == LogLevel.CRITICAL:
-            logger.critical(log_message)
+        # The record carries its own timestamp. Details are serialized once here,
+        # so the record never holds (or copies) the caller's objects
+        details_json = orjson.dumps(details, default=str).decode()
+        logger.bind(agent=agent_name, activity=activity, details_json=details_json).log(
+            level.value, f"[{agent_name}] {activity}"
+        )
     
     def log_tool_use(
         self,
@@ -120,9 +146,22 @@ class AgentLogger:
 # ==================== TRACES ====================
 # The narrative - end-to-end request flows
 
+def _span_exporter() -> SpanExporter:
+    """Human-readable spans on stdout while debugging, compact OTLP/gRPC otherwise"""
+    if settings.DEBUG:
+        return ConsoleSpanExporter()
+    from opentelemetry.exporter.otlp.proto.grpc.trace_exporter import OTLPSpanExporter
+    return OTLPSpanExporter(endpoint=settings.OTLP_ENDPOINT, insecure=True)
+
 # Configure OpenTelemetry
 trace.set_tracer_provider(TracerProvider())
-span_processor = BatchSpanProcessor(ConsoleSpanExporter())
+span_processor = BatchSpanProcessor(
+    _span_exporter(),
+    max_queue_size=settings.OTEL_BSP_MAX_QUEUE_SIZE,
+    schedule_delay_millis=settings.OTEL_BSP_SCHEDULE_DELAY_MILLIS,
+    max_export_batch_size=settings.OTEL_BSP_MAX_EXPORT_BATCH_SIZE,
+    export_timeout_millis=settings.OTEL_BSP_EXPORT_TIMEOUT_MILLIS
+)
 trace.get_tracer_provider().add_span_processor(span_processor)
 
 tracer = trace.get_tracer(__name__)
@@ -218,6 +257,41 @@ api_tokens_used = Counter(
     ['provider', 'model']
 )
 
+plan_cache_lookups_total = Counter(
+    'plan_cache_lookups_total',
+    'Orchestrator semantic plan cache lookups',
+    ['mode', 'result']
+)
+
+# Labelled children by (metric, label values); .labels() re-validates and
+# re-locks on every call, while the set of label combinations is small
+_metric_children: Dict[tuple, Any] = {}
+
+def _labeled(metric, *values: str):
+    """Child of a labelled metric, cached; values in the metric's label order"""
+    key = (metric, values)
+    child = _metric_children.get(key)
+    if child is None:
+        child = _metric_children[key] = metric.labels(*values)
+    return child
+
+# Label values outside these sets are reported as "other", so names coming
+# from LLM output can't create unbounded time series
+OTHER_LABEL = "other"
+_ALLOWED_PROVIDERS = frozenset(p.value for p in ModelProvider)
+_ALLOWED_MODELS = frozenset(
+    value for key, value in settings.model_dump().items() if key.endswith("_MODEL")
+)
+
+@lru_cache(maxsize=1)
+def _allowed_tools() -> frozenset:
+    """Public DataTools/AnalysisTools methods; imported lazily as they pull in sklearn"""
+    from app.tools.data_tools import DataTools
+    from app.tools.analysis_tools import AnalysisTools
+    return frozenset(
+        name for cls in (DataTools, AnalysisTools) for name in vars(cls) if not name.startswith("_")
+    )
+
 class AgentMetrics:
     """Metrics collection for agents"""
     
@@ -225,8 +299,8 @@ class AgentMetrics:
     def record_agent_request(agent_name: str, duration: float, success: bool):
         """Record agent request metrics"""
         status = "success" if success else "error"
-        agent_requests_total.labels(agent_name=agent_name, status=status).inc()
-        agent_request_duration.labels(agent_name=agent_name).observe(duration)
+        _labeled(agent_requests_total, agent_name, status).inc()
+        _labeled(agent_request_duration, agent_name).observe(duration)
     
     @staticmethod
     def record_tool_call(
@@ -237,17 +311,24 @@ class AgentMetrics:
     ):
         """Record tool call metrics"""
         status = "success" if success else "error"
-        tool_calls_total.labels(
-            agent_name=agent_name,
-            tool_name=tool_name,
-            status=status
-        ).inc()
-        tool_call_duration.labels(tool_name=tool_name).observe(duration)
+        if tool_name not in _allowed_tools():
+            tool_name = OTHER_LABEL
+        _labeled(tool_calls_total, agent_name, tool_name, status).inc()
+        _labeled(tool_call_duration, tool_name).observe(duration)
     
     @staticmethod
     def record_token_usage(provider: str, model: str, tokens: int):
         """Record API token usage"""
-        api_tokens_used.labels(provider=provider, model=model).inc(tokens)
+        if provider not in _ALLOWED_PROVIDERS:
+            provider = OTHER_LABEL
+        if model not in _ALLOWED_MODELS:
+            model = OTHER_LABEL
+        _labeled(api_tokens_used, provider, model).inc(tokens)
+    
+    @staticmethod
+    def record_plan_cache_lookup(mode: str, hit: bool):
+        """Record orchestrator plan cache hit/miss"""
+        _labeled(plan_cache_lookups_total, mode, "hit" if hit else "miss").inc()
     
     @staticmethod
     def update_active_sessions(count: int):
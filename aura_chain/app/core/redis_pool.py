@@ -0,0 +1,32 @@
+# app/core/redis_pool.py
+from typing import Optional
+import redis.asyncio as redis
+from app.config import get_settings
+
+settings = get_settings()
+
+# One connection pool for sessions, memory, datasets and caches. Values are
+# raw bytes (orjson/msgspec/Arrow), so responses are never decoded here.
+# The hiredis parser is picked up automatically when installed.
+_pool: Optional[redis.ConnectionPool] = None
+
+
+def get_redis() -> redis.Redis:
+    """Client on the shared pool; cheap to create, so call it where needed"""
+    global _pool
+    if _pool is None:
+        # A local UNIX socket skips the TCP stack when Redis is co-located
+        url = f"unix://{settings.REDIS_UNIX_SOCKET}" if settings.REDIS_UNIX_SOCKET else settings.REDIS_URL
+        _pool = redis.ConnectionPool.from_url(
+            url,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            protocol=settings.REDIS_PROTOCOL
+        )
+    return redis.Redis(connection_pool=_pool)
+
+
+async def close_redis():
+    global _pool
+    if _pool is not None:
+        await _pool.disconnect()
+        _pool = None
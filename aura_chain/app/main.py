@@ -1,9 +1,15 @@
 # app/main.py
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 from app.config import get_settings
 from app.core.memory import session_manager, memory_manager
+from app.agents.notifier import close_discord_client
+from app.core.api_clients import close_http_client
+from app.core.redis_pool import close_redis
 from app.api.routes import orchestrator, data, analytics, health
 import uuid
 
@@ -13,6 +19,11 @@ settings = get_settings()
 async def lifespan(app: FastAPI):
     """Startup and shutdown events"""
     # Startup
+    # The Gemini SDK is synchronous and runs via asyncio.to_thread; the stock
+    # executor (min(32, cpu + 4) threads) would cap concurrent Gemini calls
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.BLOCKING_IO_WORKERS)
+    )
     try:
         await session_manager.initialize()
         await memory_manager.initialize()
@@ -26,6 +37,9 @@ async def lifespan(app: FastAPI):
     try:
         await session_manager.close()
         await memory_manager.close()
+        await close_discord_client()
+        await close_redis()
+        await close_http_client()
         print("✓ Memory systems closed")
     except Exception as e:
         print(f"Warning: Memory cleanup failed: {e}")
@@ -33,16 +47,18 @@ async def lifespan(app: FastAPI):
 app = FastAPI(
     title=settings.APP_NAME,
     version=settings.APP_VERSION,
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse  # orjson is much faster on large dataset payloads
 )
 
 # CORS
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],
+    allow_origins=settings.ALLOWED_ORIGINS,
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    max_age=86400,  # Browsers cache preflight results for a day
 )
 
 # Include routers
@@ -67,5 +83,9 @@ if __name__ == "__main__":
         "app.main:app",
         host=settings.HOST,
         port=settings.PORT,
+        loop=settings.UVICORN_LOOP,
+        http=settings.UVICORN_HTTP,
+        # uvicorn can't combine reload with multiple workers
+        workers=1 if settings.DEBUG else settings.WORKERS,
         reload=settings.DEBUG
     )
\ No newline at end of file
@@ -1,4 +1,5 @@
-from sqlalchemy import Column, String, Integer, DateTime, Float, Boolean, JSON, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, Float, Boolean, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -41,8 +42,8 @@ class Dataset(Base):
     size_bytes = Column(Integer)
     row_count = Column(Integer)
     column_count = Column(Integer)
-    columns = Column(JSON)
-    dtypes = Column(JSON)
+    columns = Column(JSONB)
+    dtypes = Column(JSONB)
     storage_path = Column(String)
     
     user = relationship("User", back_populates="datasets")
@@ -61,7 +62,8 @@ class AgentExecution(Base):
     success = Column(Boolean)
     error = Column(String)
     tokens_used = Column(Integer)
-    metadata = Column(JSON)
+    # 'metadata' is reserved on declarative classes; the DB column keeps the name
+    meta_json = Column("metadata", JSONB)
     
     session = relationship("Session", back_populates="executions")
 
@@ -71,7 +73,7 @@ class AnalyticsResult(Base):
     id = Column(String, primary_key=True, default=lambda: str(uuid.uuid4()))
     dataset_id = Column(String, ForeignKey("datasets.id"))
     analysis_type = Column(String, nullable=False)
-    results = Column(JSON)
+    results = Column(JSONB)
     generated_at = Column(DateTime, default=datetime.utcnow)
     agent_used = Column(String)
     
@@ -84,6 +86,7 @@ class AnalyticsResult(Base):
 # scripts/setup_db.py
 """
 import asyncio
+import orjson
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from app.models.database import Base
@@ -94,7 +97,9 @@ async def setup_database():
     
     engine = create_async_engine(
         settings.DATABASE_URL,
-        echo=True
+        echo=True,
+        json_serializer=lambda v: orjson.dumps(v).decode(),
+        json_deserializer=orjson.loads
     )
     
     async with engine.begin() as conn:
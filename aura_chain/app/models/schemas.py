@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field
 from typing import Dict, Any, List, Optional
 from datetime import datetime
 from enum import Enum
@@ -18,8 +18,15 @@ class ModelProvider(str, Enum):
     GOOGLE = "google"
     OPENAI = "openai"
 
-class DatasetSchema(BaseModel):
-    dataset_id: str
+class ReadOnlySchema(BaseModel):
+    """
+    Immutable response schema; builds from ORM rows via model_validate(row).
+    Id fields also accept the ORM's plain "id" attribute.
+    """
+    model_config = ConfigDict(from_attributes=True, frozen=True)
+
+class DatasetSchema(ReadOnlySchema):
+    dataset_id: str = Field(validation_alias=AliasChoices("dataset_id", "id"))
     filename: str
     uploaded_at: datetime
     size_bytes: int
@@ -28,23 +35,24 @@ class DatasetSchema(BaseModel):
     columns: List[str]
     dtypes: Dict[str, str]
 
-class UserSchema(BaseModel):
-    user_id: str
+class UserSchema(ReadOnlySchema):
+    user_id: str = Field(validation_alias=AliasChoices("user_id", "id"))
     email: str
     company: Optional[str] = None
     created_at: datetime
     last_active: datetime
 
-class SessionSchema(BaseModel):
-    session_id: str
+class SessionSchema(ReadOnlySchema):
+    session_id: str = Field(validation_alias=AliasChoices("session_id", "id"))
     user_id: str
     started_at: datetime
-    last_activity: datetime
+    # The sessions table has no activity column; rows fall back to ended_at
+    last_activity: Optional[datetime] = Field(default=None, validation_alias=AliasChoices("last_activity", "ended_at"))
     message_count: int
     status: str  # 'active', 'ended'
 
-class AgentExecutionSchema(BaseModel):
-    execution_id: str
+class AgentExecutionSchema(ReadOnlySchema):
+    execution_id: str = Field(validation_alias=AliasChoices("execution_id", "id"))
     agent_type: AgentType
     query: str
     started_at: datetime
@@ -53,9 +61,11 @@ class AgentExecutionSchema(BaseModel):
     success: bool
     error: Optional[str] = None
     tokens_used: Optional[int] = None
+    # meta_json first: declarative ORM classes expose the table MetaData as .metadata
+    metadata: Optional[Dict[str, Any]] = Field(default=None, validation_alias=AliasChoices("meta_json", "metadata"))
 
-class AnalyticsResultSchema(BaseModel):
-    result_id: str
+class AnalyticsResultSchema(ReadOnlySchema):
+    result_id: str = Field(validation_alias=AliasChoices("result_id", "id"))
     dataset_id: str
     analysis_type: str
     results: Dict[str, Any]
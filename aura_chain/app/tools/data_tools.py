@@ -1,4 +1,5 @@
 from typing import Dict, Any, List
+from operator import eq, gt, lt, ge, le
 import pandas as pd
 import numpy as np
 from loguru import logger
@@ -6,6 +7,9 @@ from loguru import logger
 class DataTools:
     """Collection of data manipulation tools"""
     
+    # Comparison operators accepted by filter_data ("contains" is handled separately)
+    FILTER_OPERATORS = {"eq": eq, "gt": gt, "lt": lt, "gte": ge, "lte": le}
+    
     @staticmethod
     async def filter_data(
         df: pd.DataFrame,
@@ -26,7 +30,9 @@ class DataTools:
         }
         """
         try:
-            filtered_df = df.copy()
+            # AND all conditions into one mask and slice once, rather than
+            # materializing a filtered copy per condition
+            mask = np.ones(len(df), dtype=bool)
             
             for column, condition in conditions.items():
                 if column not in df.columns:
@@ -35,18 +41,12 @@ class DataTools:
                 operator = condition.get("operator", "eq")
                 value = condition.get("value")
                 
-                if operator == "eq":
-                    filtered_df = filtered_df[filtered_df[column] == value]
-                elif operator == "gt":
-                    filtered_df = filtered_df[filtered_df[column] > value]
-                elif operator == "lt":
-                    filtered_df = filtered_df[filtered_df[column] < value]
-                elif operator == "gte":
-                    filtered_df = filtered_df[filtered_df[column] >= value]
-                elif operator == "lte":
-                    filtered_df = filtered_df[filtered_df[column] <= value]
-                elif operator == "contains":
-                    filtered_df = filtered_df[filtered_df[column].str.contains(value, na=False)]
+                if operator == "contains":
+                    mask &= df[column].str.contains(value, na=False, regex=False).to_numpy(dtype=bool, na_value=False)
+                elif operator in DataTools.FILTER_OPERATORS:
+                    mask &= DataTools.FILTER_OPERATORS[operator](df[column], value).to_numpy(dtype=bool, na_value=False)
+            
+            filtered_df = df[mask]
             
             logger.info(f"Filtered from {len(df)} to {len(filtered_df)} rows")
             return filtered_df
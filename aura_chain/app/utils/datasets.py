@@ -0,0 +1,63 @@
+# app/utils/datasets.py
+import io
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+import orjson
+import pandas as pd
+from app.core.redis_pool import get_redis
+
+# Datasets live in Redis as Arrow IPC (Feather) bytes: columnar, typed, and
+# loaded without re-parsing every row the way JSON records are
+ARROW_MAGIC = b"ARROW1"
+
+
+def serialize_dataset(df: pd.DataFrame) -> bytes:
+    """Encode a DataFrame for storage in Redis"""
+    buffer = io.BytesIO()
+    df.reset_index(drop=True).to_feather(buffer)
+    return buffer.getvalue()
+
+
+def deserialize_dataset(data: bytes) -> pd.DataFrame:
+    """Decode a stored dataset, accepting legacy JSON records as well"""
+    if data[:len(ARROW_MAGIC)] == ARROW_MAGIC:
+        return pd.read_feather(io.BytesIO(data))
+    return pd.DataFrame.from_records(orjson.loads(data))
+
+
+# Decoded frames by dataset_id, so agents in one pipeline share a single load
+DATASET_CACHE_SIZE = 32
+_dataset_cache: "OrderedDict[str, pd.DataFrame]" = OrderedDict()
+
+
+async def load_dataset(dataset_id: str) -> Optional[pd.DataFrame]:
+    """Load a stored dataset by id, or None if it has expired"""
+    df = _dataset_cache.get(dataset_id)
+    if df is None:
+        data = await get_redis().get(f"dataset:{dataset_id}")
+        if not data:
+            return None
+        
+        df = deserialize_dataset(data)
+        # Agents expect dates as strings, as they arrived in the old JSON context
+        for col in df.select_dtypes(include=['datetime64']).columns:
+            df[col] = df[col].astype(str)
+        
+        _dataset_cache[dataset_id] = df
+        if len(_dataset_cache) > DATASET_CACHE_SIZE:
+            _dataset_cache.popitem(last=False)
+    else:
+        _dataset_cache.move_to_end(dataset_id)
+    
+    # Deep copy: agents clean and clip columns in place, which must never reach
+    # the cached frame other agents and later requests read
+    return df.copy()
+
+
+async def get_context_dataset(context: Dict[str, Any]) -> Optional[pd.DataFrame]:
+    """Dataset for an agent request: inline records if given, else loaded by dataset_id"""
+    if "dataset" in context:
+        return pd.DataFrame(context["dataset"])
+    if "dataset_id" in context:
+        return await load_dataset(context["dataset_id"])
+    return None
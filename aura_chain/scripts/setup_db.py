@@ -2,6 +2,7 @@ import sys
 sys.path.insert(0, '/app')
 
 import asyncio
+import orjson
 from sqlalchemy.ext.asyncio import create_async_engine
 from app.models.database import Base
 from app.config import get_settings
@@ -12,7 +13,9 @@ async def setup_database():
         
         engine = create_async_engine(
             settings.DATABASE_URL,
-            echo=True
+            echo=True,
+            json_serializer=lambda v: orjson.dumps(v).decode(),
+            json_deserializer=orjson.loads
         )
         
         async with engine.begin() as conn: